@@ -11,6 +11,7 @@ from flask_caching import Cache
 from dotenv import load_dotenv
 from celery import Celery
 from celery.schedules import crontab
+import click
 
 
 load_dotenv()
@@ -91,7 +92,12 @@ def create_app():
                 "origins": ["http://localhost:5173"],
                 "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
                 "allow_headers": ["Content-Type", "Authorization"],
-                "expose_headers": ["Content-Range"],
+                "expose_headers": [
+                    "Content-Range",
+                    "ETag",
+                    "Server-Timing",
+                    "X-Cache",
+                ],
                 "supports_credentials": True,
             }
         },
@@ -106,6 +112,14 @@ def create_app():
         response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
         return response
 
+    from .instrumentation import init_instrumentation
+
+    init_instrumentation(app)
+
+    from .metrics import init_metrics
+
+    init_metrics(app)
+
     from .api.auth import Login, Register, ForgotPasswordAPI, ResetPasswordAPI
     from .api.student import (
         Student,
@@ -126,7 +140,12 @@ def create_app():
     from .api.student_charts import StudentChartsApi
     from .api.taskAPI import TaskAPI
     from .api.csv import UserQuizExportAPI, AdminQuizExportAPI
-    from .api.payment import PaymentApi, TransactionHistoryAPI, TransactionExportAPI
+    from .api.payment import (
+        PaymentApi,
+        PaymentAccessAPI,
+        TransactionHistoryAPI,
+        TransactionExportAPI,
+    )
 
     api.add_resource(Student, "/api/students", "/api/student/<int:student_id>")
     api.add_resource(StudentActivity, "/api/student/<int:student_id>/activity")
@@ -176,6 +195,7 @@ def create_app():
         "/api/payments",
         "/api/payments/status/<int:user_id>/<int:quiz_id>",
     )
+    api.add_resource(PaymentAccessAPI, "/api/payments/access")
     api.add_resource(
         TransactionHistoryAPI,
         "/api/payments/history",
@@ -187,6 +207,40 @@ def create_app():
         "/api/export/transactions/<int:student_id>",
     )
 
+    @app.cli.command("check-query-plans")
+    def check_query_plans():
+        """Fail if any hot query falls back to a full table scan"""
+        from .query_plans import find_full_scans
+
+        offenders = find_full_scans()
+        for name, plan in offenders.items():
+            click.echo(f"Full scan in '{name}':")
+            for line in plan:
+                click.echo(f"    {line}")
+        if offenders:
+            raise SystemExit(1)
+        click.echo("All hot queries use an index.")
+
+    @app.cli.command("rebuild-rollups")
+    def rebuild_rollups_command():
+        """Recompute the dashboard rollup tables from quiz results"""
+        from .rollups import rebuild_rollups
+
+        rebuild_rollups()
+        db.session.commit()
+        click.echo("Rollup tables rebuilt.")
+
+    @app.cli.command("seed")
+    @click.option("--scale", default=1, show_default=True, help="Size multiplier")
+    @click.option("--seed", "seed_value", default=42, show_default=True)
+    def seed_command(scale, seed_value):
+        """Replace the database contents with a synthetic dataset"""
+        from .seed import generate
+
+        counts = generate(scale=scale, seed=seed_value, log=click.echo)
+        for table, count in counts.items():
+            click.echo(f"{table}: {count}")
+
     with app.app_context():
         db.create_all()
     return app
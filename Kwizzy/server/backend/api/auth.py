@@ -3,6 +3,7 @@ from flask_restful import Resource
 from werkzeug.security import generate_password_hash, check_password_hash
 from backend.models import User
 from backend import db
+from backend.cache_tags import invalidate_tags
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
@@ -10,7 +11,7 @@ from flask_jwt_extended import (
 from datetime import datetime
 from flask import current_app, request
 from itsdangerous import URLSafeTimedSerializer
-from ..tasks.celery_tasks import EmailService
+from ..tasks.celery_tasks import email_service
 import os
 import logging
 
@@ -63,6 +64,7 @@ class Register(Resource):
         # Add the new user to the database
         db.session.add(new_user)
         db.session.commit()
+        invalidate_tags("students:list")
 
         return {"message": "User registered successfully!"}, 201
 
@@ -133,7 +135,7 @@ class ForgotPasswordAPI(Resource):
                 "expiry_time": "1 hour",  # Token expiry time
             }
 
-            EmailService.send_email(
+            email_service.send_email(
                 to_email=user.email,
                 to_name=user.name,
                 subject="Password Reset Request",
@@ -178,7 +180,7 @@ class ResetPasswordAPI(Resource):
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             }
 
-            EmailService.send_email(
+            email_service.send_email(
                 to_email=user.email,
                 to_name=user.name,
                 subject="Password Reset Successful",
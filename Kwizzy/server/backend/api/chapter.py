@@ -1,11 +1,15 @@
 from flask_restful import Resource
-from ..models import Chapter, Subject
+from ..models import Chapter, Subject, Quiz
 from flask_jwt_extended import jwt_required
 from ..utils import role_required
 from flask import request
 from .. import db
 from sqlalchemy import desc
-from time import perf_counter_ns
+from ..instrumentation import timing
+from ..response_cache import cached_response
+from ..cache_tags import invalidate_tags, results_changed
+from ..grading import bump_quiz_version
+from ..rollups import result_scope, refresh_rollups, refresh_subject_rollups
 
 
 class ChapterApi(Resource):
@@ -19,13 +23,13 @@ class ChapterApi(Resource):
         return [chapter.to_dict() for chapter in chapters]
 
     def get_all_chapters(self):
-        start = perf_counter_ns()
-        chapters = Chapter.query.all()
-        end = perf_counter_ns()
-        print(f"Time taken to fetch chapters: {(end - start) / 1_000_000} ms")
+        with timing("fetch_chapters"):
+            chapters = Chapter.query.all()
         return [chapter.to_dict() for chapter in chapters]
 
     @jwt_required()
+    # Chapters are listed with their quiz counts
+    @cached_response(timeout=30, tags=["chapters", "quizzes"])
     def get(self, chapter_id=None):
         try:
             # Get a specific chapter
@@ -91,6 +95,7 @@ class ChapterApi(Resource):
 
             db.session.add(new_chapter)
             db.session.commit()
+            invalidate_tags("chapters")
 
             # Refresh the chapter to ensure all fields are loaded
             db.session.refresh(new_chapter)
@@ -157,11 +162,18 @@ class ChapterApi(Resource):
             # Update subject if provided
             new_subject_id = data.get("subject_id")
             if new_subject_id:
-                if not Subject.query.get(new_subject_id):
+                subject = Subject.query.get(new_subject_id)
+                if not subject:
                     return {"message": "Subject not found"}, 404
+                # The chapter's results move to the new subject
+                moved_from = result_scope(Quiz.chapter_id == chapter_id).subject_ids
                 chapter.subject_id = new_subject_id
+                if moved_from:
+                    db.session.flush()
+                    refresh_subject_rollups(*moved_from, subject.id)
 
             db.session.commit()
+            invalidate_tags("chapters")
 
             return {
                 "message": "Chapter updated successfully",
@@ -178,8 +190,21 @@ class ChapterApi(Resource):
     def delete(self, chapter_id):
         try:
             chapter = Chapter.query.get_or_404(chapter_id)
+            # Its quizzes and their results go with the chapter
+            quiz_ids = [
+                row[0]
+                for row in db.session.query(Quiz.id).filter(
+                    Quiz.chapter_id == chapter_id
+                )
+            ]
+            scope = result_scope(Quiz.chapter_id == chapter_id)
             db.session.delete(chapter)
+            db.session.flush()
+            refresh_rollups(scope)
             db.session.commit()
+            invalidate_tags("chapters")
+            results_changed(*scope.user_ids)
+            bump_quiz_version(*quiz_ids)
 
             return {
                 "message": "Chapter deleted successfully",
@@ -1,12 +1,50 @@
 # api/chart_api.py
 from flask_restful import Resource
+from flask import request
 from flask_jwt_extended import jwt_required
 from ..utils import role_required
-from ..models import User, QuizResult, Quiz, Chapter, Subject
-from sqlalchemy import func, desc
+from ..models import (
+    User,
+    QuizResult,
+    Quiz,
+    Chapter,
+    Subject,
+    SubjectScoreRollup,
+    UserScoreRollup,
+    DailyActivityRollup,
+)
+from sqlalchemy import func, desc, case
 from datetime import datetime, timedelta
 from .. import db, cache
 
+# (name, lower edge in percent), highest bucket first. A score falls into the
+# first bucket whose edge it reaches, so fractional scores never fall in gaps.
+DEFAULT_PERFORMANCE_BUCKETS = [
+    ("excellent", 90),
+    ("good", 70),
+    ("average", 50),
+    ("below_average", 0),
+]
+
+
+def parse_bucket_edges(edges):
+    """Turn "0,50,70,90" into unnamed buckets ordered highest first"""
+    values = sorted({float(edge) for edge in edges.split(",") if edge.strip()})
+    if not values:
+        raise ValueError("At least one bucket edge is required")
+    return [(None, int(v) if v.is_integer() else v) for v in reversed(values)]
+
+
+def bucket_labels(buckets):
+    labels = []
+    upper = None
+    for name, edge in buckets:
+        high = f"{upper - 1}" if isinstance(upper, int) else f"<{upper}"
+        span = f"{edge}-{high}" if upper is not None else f"{edge}-100"
+        labels.append(f"{name} ({span})" if name else span)
+        upper = edge
+    return labels
+
 
 class ChartDataApi(Resource):
     @jwt_required()
@@ -15,7 +53,12 @@ class ChartDataApi(Resource):
     def get(self, chart_type=None):
         try:
             if chart_type == "performance":
-                return self.get_performance_data()
+                edges = request.args.get("edges")
+                try:
+                    buckets = parse_bucket_edges(edges) if edges else None
+                except ValueError:
+                    return {"error": "Invalid bucket edges"}, 400
+                return self.get_performance_data(buckets)
             elif chart_type == "qualifications":
                 return self.get_qualification_data()
             elif chart_type == "activity":
@@ -27,34 +70,40 @@ class ChartDataApi(Resource):
         except Exception as e:
             return {"error": str(e)}, 500
 
-    def get_performance_data(self):
-        """Get performance distribution data"""
+    def get_performance_data(self, buckets=None):
+        """
+        Get performance distribution data: the number of students with at
+        least one result in each score bucket, computed in a single grouped
+        query over quiz_results
+        """
         try:
-            performance_ranges = {
-                "excellent (90-100)": (90, 100),
-                "good (70-89)": (70, 89),
-                "average (50-69)": (50, 69),
-                "below_average (0-49)": (0, 49),
-            }
+            buckets = buckets or DEFAULT_PERFORMANCE_BUCKETS
+            percentage = (
+                QuizResult.marks_scored * 100.0 / func.nullif(QuizResult.total_marks, 0)
+            )
+            bucket = case(
+                *[
+                    (percentage >= edge, index)
+                    for index, (_, edge) in enumerate(buckets)
+                ],
+                else_=None,
+            )
 
-            performance_stats = {}
-            for range_name, (min_score, max_score) in performance_ranges.items():
-                count = (
-                    db.session.query(func.count(func.distinct(User.id)))
-                    .join(QuizResult)
-                    .filter(
-                        User.role == "student",
-                        (
-                            QuizResult.marks_scored * 100 / QuizResult.total_marks
-                        ).between(min_score, max_score),
-                    )
-                    .scalar()
+            rows = (
+                db.session.query(
+                    bucket.label("bucket"),
+                    func.count(func.distinct(QuizResult.user_id)),
                 )
-                performance_stats[range_name] = count
+                .join(User, User.id == QuizResult.user_id)
+                .filter(User.role == "student")
+                .group_by(bucket)
+                .all()
+            )
+            counts = {index: count for index, count in rows if index is not None}
 
             return {
-                "labels": list(performance_ranges.keys()),
-                "data": list(performance_stats.values()),
+                "labels": bucket_labels(buckets),
+                "data": [counts.get(index, 0) for index in range(len(buckets))],
             }
         except Exception as e:
             return {"error": str(e)}, 500
@@ -79,21 +128,31 @@ class ChartDataApi(Resource):
     def get_activity_data(self):
         """Get student activity data"""
         try:
+            since = datetime.now() - timedelta(days=30)
             total_students = User.query.filter_by(role="student").count()
 
             active_students = (
-                User.query.join(QuizResult)
-                .filter(
-                    User.role == "student",
-                    QuizResult.completed_at >= (datetime.now() - timedelta(days=30)),
+                db.session.query(func.count(UserScoreRollup.user_id))
+                .join(User, User.id == UserScoreRollup.user_id)
+                .filter(User.role == "student", UserScoreRollup.last_active >= since)
+                .scalar()
+            )
+
+            daily_activity = (
+                DailyActivityRollup.query.filter(
+                    DailyActivityRollup.day >= since.date()
                 )
-                .distinct()
-                .count()
+                .order_by(DailyActivityRollup.day)
+                .all()
             )
 
             return {
                 "labels": ["Active", "Inactive"],
                 "data": [active_students, total_students - active_students],
+                "daily": {
+                    "labels": [row.day.strftime("%Y-%m-%d") for row in daily_activity],
+                    "data": [row.attempts for row in daily_activity],
+                },
             }
         except Exception as e:
             return {"error": str(e)}, 500
@@ -101,20 +160,18 @@ class ChartDataApi(Resource):
     def get_subject_data(self):
         """Get subject-wise performance data"""
         try:
+            # Read the per-subject rollups instead of aggregating quiz_results
             subject_stats = (
                 db.session.query(
                     Subject.name,
-                    func.avg(
-                        (QuizResult.marks_scored * 100.0) / QuizResult.total_marks
+                    (
+                        SubjectScoreRollup.score_sum
+                        / func.nullif(SubjectScoreRollup.scored_attempts, 0)
                     ).label("avg_score"),
-                    func.count(func.distinct(QuizResult.user_id)).label(
-                        "student_count"
-                    ),
+                    SubjectScoreRollup.student_count,
                 )
-                .join(Quiz, Quiz.id == QuizResult.quiz_id)
-                .join(Chapter, Chapter.id == Quiz.chapter_id)
-                .join(Subject, Subject.id == Chapter.subject_id)
-                .group_by(Subject.name)
+                .join(SubjectScoreRollup, SubjectScoreRollup.subject_id == Subject.id)
+                .order_by(Subject.name)
                 .all()
             )
             total_subjects = Subject.query.count()
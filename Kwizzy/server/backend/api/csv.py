@@ -7,11 +7,16 @@ from flask import current_app, url_for, request
 import csv
 import os
 from datetime import datetime
+from itertools import groupby
 import logging
+from sqlalchemy import case, func, select
 from ..tasks.celery_tasks import send_export_notification
 
 logger = logging.getLogger(__name__)
 
+# Rows per fetch from the export queries, and how often progress is reported
+EXPORT_CHUNK_SIZE = 1000
+
 # Create CSV directory if it doesn't exist
 app_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 relative_path = os.getenv("UPLOAD_FOLDER").lstrip("./")
@@ -89,6 +94,8 @@ class AdminQuizExportAPI(Resource):
             "task_id": task_id,
             "status": task.status,
             "result": task.result if task.ready() else None,
+            # {"processed", "total"} while the export is running
+            "progress": task.info if task.status == "PROGRESS" else None,
         }
 
 
@@ -178,8 +185,69 @@ def generate_user_quiz_export(user_id):
         return {"status": "error", "message": str(e)}
 
 
-@celery.task
-def generate_admin_quiz_export(admin_id):
+def _as_date(value):
+    """SQLite returns date() as a string"""
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return value
+
+
+def student_quiz_summaries():
+    """
+    Per-student totals, average/best score, last quiz date and distinct
+    subjects in one grouped query, streamed in chunks ordered by user id.
+    Only students with at least one result are included.
+    """
+    score = case(
+        (
+            QuizResult.total_marks > 0,
+            QuizResult.marks_scored * 100.0 / QuizResult.total_marks,
+        ),
+        else_=0.0,
+    )
+    query = (
+        select(
+            User.id,
+            User.name,
+            User.email,
+            func.count(QuizResult.id),
+            func.avg(score),
+            func.max(score),
+            func.max(QuizResult.completed_at),
+            func.count(func.distinct(Chapter.subject_id)),
+        )
+        .join(QuizResult, QuizResult.user_id == User.id)
+        .join(Quiz, Quiz.id == QuizResult.quiz_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .where(User.role == "student")
+        .group_by(User.id, User.name, User.email)
+        .order_by(User.id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    return db.session.execute(query)
+
+
+def student_quiz_days():
+    """
+    (user_id, [days]) for every student, days distinct and newest first,
+    from one query streamed in the same user order as the summaries.
+    """
+    day = func.date(QuizResult.completed_at)
+    query = (
+        select(QuizResult.user_id, day)
+        .join(User, User.id == QuizResult.user_id)
+        .where(User.role == "student")
+        .distinct()
+        .order_by(QuizResult.user_id, day.desc())
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    rows = db.session.execute(query)
+    for user_id, days in groupby(rows, key=lambda row: row[0]):
+        yield user_id, [_as_date(row[1]) for row in days]
+
+
+@celery.task(bind=True)
+def generate_admin_quiz_export(self, admin_id):
     """Generate CSV export of all users' quiz data"""
     try:
         # Check if admin exists
@@ -201,8 +269,13 @@ def generate_admin_quiz_export(admin_id):
         filename = f"admin_export_{timestamp}.csv"
         filepath = os.path.join(CSV_FOLDER, filename)
 
-        # Get all students
-        students = User.query.filter_by(role="student").all()
+        total = (
+            db.session.query(func.count(func.distinct(QuizResult.user_id)))
+            .join(User, User.id == QuizResult.user_id)
+            .filter(User.role == "student")
+            .scalar()
+        )
+        self.update_state(state="PROGRESS", meta={"processed": 0, "total": total})
 
         # Write to CSV file
         with open(filepath, "w", newline="") as csvfile:
@@ -223,51 +296,50 @@ def generate_admin_quiz_export(admin_id):
                     "Performance Level",
                 ]
             )
-            index = 1
-            # Write data for each student
-            for student in students:
-
-                quiz_results = QuizResult.query.filter_by(user_id=student.id).all()
-
-                if quiz_results:
-                    total_quizzes = len(quiz_results)
-                    avg_score = (
-                        sum(
-                            (r.marks_scored / r.total_marks) * 100 for r in quiz_results
-                        )
-                        / total_quizzes
-                    )
-                    best_score = max(
-                        (r.marks_scored / r.total_marks) * 100 for r in quiz_results
-                    )
-                    last_quiz_date = max(r.completed_at for r in quiz_results)
-
-                    streak = calculate_streak(quiz_results)
-                    subjects = len(set(r.quiz.chapter.subject_id for r in quiz_results))
-                    performance_level = get_performance_level(avg_score)
-
-                    writer.writerow(
-                        [
-                            index,
-                            student.name,
-                            student.email,
-                            total_quizzes,
-                            f"{avg_score:.2f}",
-                            f"{best_score:.2f}",
-                            last_quiz_date.strftime("%Y-%m-%d"),
-                            streak,
-                            subjects,
-                            performance_level,
-                        ]
+
+            # Both streams are ordered by user id and cover the same
+            # students, so they are walked side by side
+            days_by_student = student_quiz_days()
+            for index, row in enumerate(student_quiz_summaries(), 1):
+                (
+                    student_id,
+                    name,
+                    email,
+                    total_quizzes,
+                    avg_score,
+                    best_score,
+                    last_quiz_date,
+                    subjects,
+                ) = row
+                days_student_id, days = next(days_by_student)
+                if days_student_id != student_id:
+                    raise RuntimeError("Export streams are out of step")
+
+                writer.writerow(
+                    [
+                        index,
+                        name,
+                        email,
+                        total_quizzes,
+                        f"{avg_score:.2f}",
+                        f"{best_score:.2f}",
+                        last_quiz_date.strftime("%Y-%m-%d"),
+                        calculate_streak(days),
+                        subjects,
+                        get_performance_level(avg_score),
+                    ]
+                )
+
+                if index % EXPORT_CHUNK_SIZE == 0:
+                    self.update_state(
+                        state="PROGRESS", meta={"processed": index, "total": total}
                     )
-                    index += 1
 
         # Generate download URL
         base_url = os.getenv("BASE_URL", "http://localhost:5000")
         download_url = f"{base_url}/static/uploads/subjects/csv/{filename}"
 
         # Send email notification
-        admin = User.query.get(admin_id)
         send_export_notification.delay(
             admin.email, admin.name, "Admin Export Ready", download_url
         )
@@ -292,13 +364,14 @@ def get_remarks(score):
         return "Needs improvement"
 
 
-def calculate_streak(quiz_results):
-    """Calculate current streak of consecutive days with quizzes"""
-    if not quiz_results:
+def calculate_streak(dates):
+    """
+    Calculate current streak of consecutive days with quizzes, given the
+    distinct quiz dates newest first
+    """
+    if not dates:
         return 0
 
-    dates = sorted(set(r.completed_at.date() for r in quiz_results), reverse=True)
-
     streak = 1
     for i in range(len(dates) - 1):
         if (dates[i] - dates[i + 1]).days == 1:
@@ -5,6 +5,7 @@ from flask_jwt_extended import jwt_required
 from ..utils import role_required
 from flask import request
 from .. import db
+from ..grading import bump_quiz_version
 
 
 class OptionApi(Resource):
@@ -86,6 +87,7 @@ class OptionApi(Resource):
 
             db.session.add(new_option)
             db.session.commit()
+            bump_quiz_version(question.quiz_id)
 
             return {
                 "message": "Option created successfully",
@@ -147,6 +149,7 @@ class OptionApi(Resource):
                         }, 400
 
             db.session.commit()
+            bump_quiz_version(option.question.quiz_id)
 
             return {
                 "message": "Option updated successfully",
@@ -190,8 +193,10 @@ class OptionApi(Resource):
                         "message": "Cannot delete the only correct option. Question must have at least one correct answer"
                     }, 400
 
+            quiz_id = option.question.quiz_id
             db.session.delete(option)
             db.session.commit()
+            bump_quiz_version(quiz_id)
 
             return {"message": "Option deleted successfully"}, 200
 
@@ -242,6 +247,7 @@ class OptionsBulkApi(Resource):
                 new_options.append(option)
 
             db.session.commit()
+            bump_quiz_version(question.quiz_id)
 
             return {
                 "message": "Options created successfully",
@@ -1,11 +1,13 @@
 from flask_restful import Resource
-from ..models import PaymentHistory
-from flask_jwt_extended import jwt_required
-from flask import request, send_file, current_app
+from ..models import PaymentHistory, Quiz
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import request, Response, stream_with_context
+from sqlalchemy import select
 from .. import db
+from ..utils import format_ist_datetime
+from ..entitlements import has_paid, quiz_access, refresh_paid_quizzes
 import csv
-import os
-from uuid import uuid4
+import io
 from datetime import datetime
 
 
@@ -25,6 +27,7 @@ class PaymentApi(Resource):
 
             db.session.add(payment)
             db.session.commit()
+            refresh_paid_quizzes(payment.user_id)
 
             return {
                 "status": "success",
@@ -39,11 +42,33 @@ class PaymentApi(Resource):
     @jwt_required()
     def get(self, user_id, quiz_id):
         try:
-            payment = PaymentHistory.query.filter_by(
-                user_id=user_id, quiz_id=quiz_id, status="completed"
-            ).first()
+            return {"has_paid": has_paid(user_id, quiz_id)}, 200
+        except Exception as e:
+            print("Error:", str(e))
+            return {"error": str(e)}, 500
+
+
+class PaymentAccessAPI(Resource):
+    MAX_QUIZ_IDS = 500
 
-            return {"has_paid": payment is not None}, 200
+    @jwt_required()
+    def get(self):
+        """Access flags for the current user on many quizzes (?quiz_ids=1,2,3)"""
+        try:
+            raw_ids = request.args.get("quiz_ids", "")
+            try:
+                quiz_ids = {int(quiz_id) for quiz_id in raw_ids.split(",") if quiz_id}
+            except ValueError:
+                return {"error": "quiz_ids must be a comma separated list of ids"}, 400
+            if not quiz_ids:
+                return {"error": "quiz_ids is required"}, 400
+            if len(quiz_ids) > self.MAX_QUIZ_IDS:
+                return {
+                    "error": f"At most {self.MAX_QUIZ_IDS} quiz ids per request"
+                }, 400
+
+            access = quiz_access(get_jwt_identity(), quiz_ids)
+            return {"quizzes": {str(k): v for k, v in access.items()}}, 200
         except Exception as e:
             print("Error:", str(e))
             return {"error": str(e)}, 500
@@ -64,109 +89,65 @@ class TransactionHistoryAPI(Resource):
 
 
 class TransactionExportAPI(Resource):
+    CHUNK_SIZE = 1000
+    HEADER = ["S.No", "Transaction ID", "Quiz Name", "Amount in Rs.", "Payment Date"]
+
+    def stream_csv(self, result):
+        """Yield the CSV one chunk of rows at a time"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.HEADER)
+        index = 0
+        for rows in result.partitions():
+            for transaction_id, quiz_name, amount, created_at in rows:
+                index += 1
+                writer.writerow(
+                    [
+                        index,
+                        transaction_id,
+                        quiz_name,
+                        amount,
+                        format_ist_datetime(created_at),
+                    ]
+                )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if index == 0:
+            yield buffer.getvalue()
+
     @jwt_required()
     def get(self, student_id=None):
-        if student_id:
-            try:
-                # Create filename with timestamp
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = (
-                    f"transactions_{student_id}_{timestamp}_{uuid4().hex[:8]}.csv"
+        try:
+            # One joined query read in chunks, so neither the rows nor the
+            # file are ever held in full
+            query = (
+                select(
+                    PaymentHistory.transaction_id,
+                    Quiz.name,
+                    PaymentHistory.amount,
+                    PaymentHistory.created_at,
                 )
+                .join(Quiz, Quiz.id == PaymentHistory.quiz_id)
+                .order_by(PaymentHistory.id)
+                .execution_options(yield_per=self.CHUNK_SIZE)
+            )
 
-                # Create filepath
-                csv_folder = os.path.join(current_app.config["UPLOAD_FOLDER"], "csv")
-                os.makedirs(csv_folder, exist_ok=True)
-                filepath = os.path.join(csv_folder, filename)
-
-                # Get transactions
-                transactions = PaymentHistory.query.filter_by(user_id=student_id).all()
-                # use to_dict() method to get the data in the required format
-                transactions = [payment.to_dict() for payment in transactions]
-                print(transactions)
-
-                # Write to CSV
-                with open(filepath, "w", newline="") as file:
-                    writer = csv.writer(file)
-                    writer.writerow(
-                        [
-                            "S.No",
-                            "Transaction ID",
-                            "Quiz Name",
-                            "Amount in Rs.",
-                            "Payment Date",
-                        ]
-                    )
-
-                    for index, transaction in enumerate(transactions, 1):
-                        writer.writerow(
-                            [
-                                index,
-                                transaction["transaction_id"],
-                                transaction["quiz"],
-                                transaction["amount"],
-                                transaction["created_at"],
-                            ]
-                        )
-
-                return send_file(
-                    filepath,
-                    as_attachment=True,
-                    download_name=filename,
-                    mimetype="text/csv",
-                )
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            if student_id:
+                query = query.where(PaymentHistory.user_id == student_id)
+                filename = f"transactions_{student_id}_{timestamp}.csv"
+            else:
+                filename = f"transactions_{timestamp}.csv"
 
-            except Exception as e:
-                print(f"Error exporting transactions: {str(e)}")
-                return {"error": str(e)}, 500
+            result = db.session.execute(query)
 
-        else:
-            try:
-                # Create filename with timestamp
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"transactions_{timestamp}_{uuid4().hex[:8]}.csv"
-
-                # Create filepath
-                csv_folder = os.path.join(current_app.config["UPLOAD_FOLDER"], "csv")
-                os.makedirs(csv_folder, exist_ok=True)
-                filepath = os.path.join(csv_folder, filename)
-
-                # Get transactions
-                transactions = PaymentHistory.query.all()
-                # use to_dict() method to get the data in the required format
-                transactions = [payment.to_dict() for payment in transactions]
-
-                # Write to CSV
-                with open(filepath, "w", newline="") as file:
-                    writer = csv.writer(file)
-                    writer.writerow(
-                        [
-                            "S.No",
-                            "Transaction ID",
-                            "Quiz Name",
-                            "Amount in Rs.",
-                            "Payment Date",
-                        ]
-                    )
-
-                    for index, transaction in enumerate(transactions, 1):
-                        writer.writerow(
-                            [
-                                index,
-                                transaction["transaction_id"],
-                                transaction["quiz"],
-                                transaction["amount"],
-                                transaction["created_at"],
-                            ]
-                        )
-
-                return send_file(
-                    filepath,
-                    as_attachment=True,
-                    download_name=filename,
-                    mimetype="text/csv",
-                )
+            return Response(
+                stream_with_context(self.stream_csv(result)),
+                mimetype="text/csv",
+                headers={"Content-Disposition": f"attachment; filename={filename}"},
+            )
 
-            except Exception as e:
-                print(f"Error exporting transactions: {str(e)}")
-                return {"error": str(e)}, 500
+        except Exception as e:
+            print(f"Error exporting transactions: {str(e)}")
+            return {"error": str(e)}, 500
@@ -4,6 +4,7 @@ from flask_jwt_extended import jwt_required
 from ..utils import role_required
 from flask import request
 from .. import db
+from ..grading import bump_quiz_version
 
 
 class QuestionApi(Resource):
@@ -45,6 +46,7 @@ class QuestionApi(Resource):
 
             db.session.add(question)
             db.session.commit()
+            bump_quiz_version(quiz.id)
 
             return {
                 "message": "Question added successfully",
@@ -65,6 +67,7 @@ class QuestionApi(Resource):
             ).first_or_404()
             db.session.delete(question)
             db.session.commit()
+            bump_quiz_version(quiz_id)
 
             return {"message": "Question deleted successfully"}, 200
 
@@ -1,60 +1,50 @@
 from flask_restful import Resource
-from ..models import Quiz, Chapter, Question, Option
+from ..models import Quiz, Chapter, Question, Option, QuizResult
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..utils import role_required
-from flask import request
+from flask import request, Response
 from .. import db
+from ..grading import bump_quiz_version
+from ..snapshots import get_quiz_snapshot, snapshot_etag
+from ..rollups import result_scope, refresh_rollups, refresh_subject_rollups
+from ..response_cache import cached_response
+from ..cache_tags import invalidate_tags, results_changed
+
+
+def quiz_list_tags(quiz_id=None, chapter_id=None):
+    """
+    Quiz lists depend on every quiz (see bump_quiz_version); a single quiz is
+    served from its snapshot instead
+    """
+    return None if quiz_id else ["quizzes"]
 
 
 class QuizApi(Resource):
     @jwt_required()
+    @cached_response(timeout=30, tags=quiz_list_tags)
     def get(self, quiz_id=None, chapter_id=None):
         try:
             # Get specific quiz
             if quiz_id:
                 user_id = get_jwt_identity()
-                quiz = Quiz.query.get_or_404(quiz_id)
-                has_attempted = quiz.has_attempted(user_id)
+                include_answers = request.args.get("include_answers") == "true"
+                snapshot, version = get_quiz_snapshot(quiz_id, include_answers)
+                if snapshot is None:
+                    return {"message": "Quiz not found"}, 404
+
+                has_attempted = (
+                    QuizResult.query.filter_by(user_id=user_id, quiz_id=quiz_id).first()
+                    is not None
+                )
 
-                time_in_seconds = quiz.time_duration
-                hours = time_in_seconds // 3600
-                minutes = (time_in_seconds % 3600) // 60
-                formatted_time = f"{hours:02d}:{minutes:02d}"
-                return {
-                    "id": quiz.id,
-                    "name": quiz.name,
-                    "description": quiz.description,
-                    "price": quiz.price,
-                    "chapter_id": quiz.chapter_id,
-                    "time_duration": formatted_time,
-                    "one_attempt_only": quiz.one_attempt_only,
-                    "has_attempted": has_attempted,
-                    "deadline": (
-                        quiz.deadline.strftime("%d-%m-%Y %H:%M")
-                        if quiz.deadline
-                        else None
-                    ),
-                    "questions": [
-                        {
-                            "id": q.id,
-                            "title": q.title,
-                            "text": q.text,
-                            "options": [
-                                {
-                                    "id": opt.id,
-                                    "text": opt.text,
-                                    "is_correct": (
-                                        opt.is_correct
-                                        if request.args.get("include_answers") == "true"
-                                        else None
-                                    ),
-                                }
-                                for opt in q.options
-                            ],
-                        }
-                        for q in quiz.questions
-                    ],
-                }, 200
+                # The snapshot only changes with the quiz version, so clients can
+                # revalidate with If-None-Match instead of downloading it again
+                etag = snapshot_etag(quiz_id, version, include_answers, has_attempted)
+                headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+                if request.if_none_match.contains(etag):
+                    return Response(status=304, headers=headers)
+
+                return {**snapshot, "has_attempted": has_attempted}, 200, headers
 
             if chapter_id:
                 # Get all quizzes in a chapter
@@ -198,6 +188,7 @@ class QuizApi(Resource):
 
             db.session.add(new_quiz)
             db.session.commit()
+            invalidate_tags("quizzes")
 
             return {"message": "Quiz created successfully", "quiz_id": new_quiz.id}, 201
 
@@ -217,6 +208,7 @@ class QuizApi(Resource):
                 return {"message": "No input data provided"}, 400
 
             db.session.begin_nested()
+            moved_from = []
 
             # Update basic quiz info
             if "name" in data:
@@ -238,8 +230,11 @@ class QuizApi(Resource):
                 except ValueError:
                     return {"message": "Invalid time format"}, 400
             if "chapter_id" in data:
-                if not Chapter.query.get(data["chapter_id"]):
+                chapter = Chapter.query.get(data["chapter_id"])
+                if not chapter:
                     return {"message": "Chapter not found"}, 404
+                # The quiz's results move to the new chapter's subject
+                moved_from = result_scope(QuizResult.quiz_id == quiz_id).subject_ids
                 quiz.chapter_id = data["chapter_id"]
 
             if "questions" in data:
@@ -311,7 +306,11 @@ class QuizApi(Resource):
                             "message": f"Question '{question.text}' must have at least one correct option"
                         }, 400
 
+            if moved_from:
+                db.session.flush()
+                refresh_subject_rollups(*moved_from, chapter.subject_id)
             db.session.commit()
+            bump_quiz_version(quiz_id)
             return {"message": "Quiz updated successfully"}, 200
 
         except Exception as e:
@@ -324,9 +323,15 @@ class QuizApi(Resource):
     def delete(self, quiz_id):
         try:
             quiz = Quiz.query.get_or_404(quiz_id)
+            # The quiz's results go with it
+            scope = result_scope(QuizResult.quiz_id == quiz_id)
 
             db.session.delete(quiz)
+            db.session.flush()
+            refresh_rollups(scope)
             db.session.commit()
+            results_changed(*scope.user_ids)
+            bump_quiz_version(quiz_id)
 
             return {"message": "Quiz deleted successfully"}, 200
 
@@ -4,26 +4,72 @@ from ..models import QuizResult, UserAnswer
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from flask import request
 from .. import db
-from sqlalchemy.orm import joinedload
+from sqlalchemy import DateTime, and_, func, literal, or_
+from sqlalchemy.orm import lazyload
+from datetime import datetime
+from ..submissions import record_submission
+from ..utils import encode_cursor, decode_cursor
+from ..cache_tags import results_changed
+
+MAX_PAGE_SIZE = 100
+# Sort and cursor value standing in for a missing completed_at
+UNKNOWN_COMPLETED_AT = datetime(1970, 1, 1)
 
 
 class QuizResultApi(Resource):
     def get_quiz_result_by_id(self, result_id):
         try:
-            # Use joinedload to load relationships efficiently
+            # Answers are serialized in batch, so skip the joined answer load
             quiz_result = QuizResult.query.options(
-                joinedload(QuizResult.quiz),
-                joinedload(QuizResult.user_answers).joinedload(
-                    UserAnswer.selected_option_rel
-                ),
+                lazyload(QuizResult.user_answers)
             ).get_or_404(result_id)
             return quiz_result.to_dict()
         except Exception as e:
             return ({"error": f"Error fetching quiz result: {str(e)}"}), 500
 
-    def get_user_quiz_results(self, user_id):
-        results = QuizResult.query.filter_by(user_id=user_id).all()
-        return [result.to_dict() for result in results]
+    def get_user_quiz_results(self, user_id, cursor=None, limit=20, expand=False):
+        """
+        One page of a user's results, latest first, using keyset pagination
+        over (completed_at, id). Answers are only loaded when expand is set.
+        """
+        query = QuizResult.query.options(lazyload(QuizResult.user_answers)).filter(
+            QuizResult.user_id == user_id
+        )
+        # Results without a completion time sort last rather than break the
+        # cursor
+        completed = func.coalesce(
+            QuizResult.completed_at, literal(UNKNOWN_COMPLETED_AT, DateTime)
+        )
+        if cursor:
+            completed_at, result_id = decode_cursor(cursor, datetime, int)
+            query = query.filter(
+                or_(
+                    completed < completed_at,
+                    and_(completed == completed_at, QuizResult.id < result_id),
+                )
+            )
+
+        # Fetch one extra row to know whether another page exists
+        results = (
+            query.order_by(completed.desc(), QuizResult.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        has_more = len(results) > limit
+        results = results[:limit]
+
+        next_cursor = None
+        if has_more:
+            last = results[-1]
+            next_cursor = encode_cursor(
+                last.completed_at or UNKNOWN_COMPLETED_AT, last.id
+            )
+
+        return {
+            "results": QuizResult.to_dict_many(results, include_answers=expand),
+            "next_cursor": next_cursor,
+            "limit": limit,
+        }
 
     @jwt_required()
     def get(self, result_id=None):
@@ -34,14 +80,29 @@ class QuizResultApi(Resource):
             user_role = claims.get("role")
 
             if result_id:
-                result = QuizResult.query.get_or_404(result_id)
+                result = QuizResult.query.options(
+                    lazyload(QuizResult.user_answers)
+                ).get_or_404(result_id)
                 # Ensure user and admin can only access the results
                 if result.user_id == user_id or user_role == "admin":
                     return self.get_quiz_result_by_id(result_id)
                 else:
                     return {"message": "Unauthorized to access this resource"}, 403
 
-            return {"results": self.get_user_quiz_results(user_id)}
+            limit = request.args.get("limit", 20, type=int)
+            if limit < 1:
+                return {"message": "Invalid limit"}, 400
+            expand = "answers" in request.args.get("expand", "").split(",")
+
+            try:
+                return self.get_user_quiz_results(
+                    user_id,
+                    cursor=request.args.get("cursor"),
+                    limit=min(limit, MAX_PAGE_SIZE),
+                    expand=expand,
+                )
+            except ValueError as e:
+                return {"message": str(e)}, 400
 
         except Exception as e:
             return {"message": str(e)}, 500
@@ -57,28 +118,19 @@ class QuizResultApi(Resource):
                 if field not in data:
                     return {"message": f"{field} is required"}, 400
 
-            # Create quiz result
-            new_result = QuizResult(
+            # Create quiz result and user answers in one batch
+            result_id, _ = record_submission(
                 quiz_id=data["quiz_id"],
                 user_id=user_id,
                 marks_scored=data.get("marks_scored"),
                 total_marks=data.get("total_marks"),
+                answers=data["answers"],
             )
-
-            db.session.add(new_result)
-            db.session.flush()
-
-            # Create user answers
-            for answer in data["answers"]:
-                user_answer = UserAnswer(
-                    result_id=new_result.id,
-                    question_id=answer["question_id"],
-                    selected_option=answer.get("selected_option"),
-                    is_correct=answer.get("is_correct", False),
-                )
-                db.session.add(user_answer)
-
             db.session.commit()
+            results_changed(user_id)
+            new_result = QuizResult.query.options(
+                lazyload(QuizResult.user_answers)
+            ).get(result_id)
 
             return {
                 "message": "Quiz result created successfully",
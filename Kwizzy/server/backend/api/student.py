@@ -4,18 +4,35 @@ from flask_caching import Cache
 from flask_jwt_extended import jwt_required
 from ..utils import role_required
 from ..models import User, QuizResult, Quiz, Chapter, Subject
+from ..cache_tags import invalidate_tags
 from sqlalchemy import func, desc
 from datetime import datetime, timedelta
 from .. import db
-from .. import cache
+from ..response_cache import cached_response
+from ..student_directory import page_students, count_students
+from ..rollups import create_missing_rollups
+
+
+def student_tags(student_id=None):
+    """
+    Cache tags of a Student response, invalidated by invalidate_student and
+    results_changed (cache_tags.py)
+    """
+    return [f"student:{student_id}"] if student_id else ["students:list"]
+
+
+def invalidate_student(student_id):
+    """Drop cached responses showing a student, after their data changed"""
+    invalidate_tags(f"student:{student_id}", "students:list")
 
 
 class Student(Resource):
     def to_dict(self, user):
         """Convert user object to dictionary with relevant student information"""
-        # Calculate quiz statistics
-        total_quizzes = len(user.quiz_results)
-        latest_activity = max([r.completed_at for r in user.quiz_results], default=None)
+        # Quiz statistics come from the student's rollup row (see rollups.py),
+        # so no results or answers are loaded here
+        rollup = user.score_rollup
+        latest_activity = rollup.last_active if rollup else None
 
         return {
             "id": user.id,
@@ -25,14 +42,14 @@ class Student(Resource):
             "qualification": user.qualification,
             "profile_pic": user.profile_pic,
             "quiz_stats": {
-                "total_quizzes_attempted": total_quizzes,
+                "total_quizzes_attempted": rollup.attempts if rollup else 0,
                 "last_active": (
                     latest_activity.strftime("%Y-%m-%d %H:%M")
                     if latest_activity
                     else None
                 ),
-                "performance_percentage": self.calculate_performance_percentage(
-                    user.quiz_results
+                "performance_percentage": (
+                    round(rollup.performance, 2) if rollup else 0
                 ),
             },
         }
@@ -99,16 +116,6 @@ class Student(Resource):
         except Exception as e:
             return {"error": str(e)}
 
-    def calculate_performance_percentage(self, quiz_results):
-        """Calculate overall performance percentage"""
-        total_marks_scored = sum(r.marks_scored or 0 for r in quiz_results)
-        total_possible_marks = sum(r.total_marks or 0 for r in quiz_results)
-
-        if total_possible_marks == 0:
-            return 0
-
-        return round((total_marks_scored / total_possible_marks) * 100, 2)
-
     def get_detailed_performance(self, user):
         """Get detailed performance breakdown"""
         quiz_details = []
@@ -143,22 +150,18 @@ class Student(Resource):
         return quiz_details
 
     @jwt_required()
-    @cache.memoize(timeout=30)
+    @cached_response(timeout=30, tags=student_tags)
     def get(self, student_id=None):
         try:
-            cache_key = f"students_{student_id or 'all'}_{request.args.get('page', 1)}_{request.args.get('per_page', 10)}_{request.args.get('search', '').strip()}_{request.args.get('sort_by', 'name')}_{request.args.get('order', 'asc')}"
-            cached_data = cache.get(cache_key)
-
-            if cached_data:
-                return cached_data, 200
             if not self.validate_pagination_params(
                 request.args.get("page", 1), request.args.get("per_page", 10)
             ):
-                return (None, 400, "Invalid pagination parameters")
+                return {"message": "Invalid pagination parameters"}, 400
             if student_id:
                 student = User.query.filter_by(id=student_id, role="student").first()
                 if not student:
                     return {"message": "Student not found"}, 404
+                create_missing_rollups([student])
 
                 return {
                     "student_info": self.to_dict(student),
@@ -168,65 +171,41 @@ class Student(Resource):
             # Get all students with pagination and filters
             page = request.args.get("page", 1, type=int)
             per_page = request.args.get("per_page", 10, type=int)
+            cursor = request.args.get("cursor")
             search = request.args.get("search", "").strip()
             sort_by = request.args.get("sort_by", "name")
             order = request.args.get("order", "asc")
-
-            query = User.query.filter_by(role="student")
-
-            if search:
-                query = query.filter(
-                    (User.name.ilike(f"%{search}%"))
-                    | (User.email.ilike(f"%{search}%"))
-                    | (User.qualification.ilike(f"%{search}%"))
+            min_performance = request.args.get("min_performance", type=float)
+            max_performance = request.args.get("max_performance", type=float)
+
+            try:
+                students, next_cursor = page_students(
+                    sort_by=sort_by,
+                    order=order,
+                    per_page=per_page,
+                    cursor=cursor,
+                    page=page,
+                    search=search,
+                    min_performance=min_performance,
+                    max_performance=max_performance,
                 )
+            except ValueError as e:
+                return {"message": str(e)}, 400
 
-            # Apply sorting
-            if sort_by == "performance":
-                # Complex sorting by average performance
-                if order == "desc":
-                    query = query.order_by(
-                        desc(
-                            func.coalesce(
-                                func.avg(
-                                    (QuizResult.marks_scored * 100.0)
-                                    / QuizResult.total_marks
-                                ),
-                                0,
-                            )
-                        )
-                    )
-                else:
-                    query = query.order_by(
-                        func.coalesce(
-                            func.avg(
-                                (QuizResult.marks_scored * 100.0)
-                                / QuizResult.total_marks
-                            ),
-                            0,
-                        )
-                    )
-            else:
-                if order == "desc":
-                    query = query.order_by(desc(getattr(User, sort_by)))
-                else:
-                    query = query.order_by(getattr(User, sort_by))
-
-            pagination = query.paginate(page=page, per_page=per_page)
-
+            total = count_students(search, min_performance, max_performance)
             result = {
-                "students": [self.to_dict(student) for student in pagination.items],
-                "total": pagination.total,
-                "pages": pagination.pages,
-                "current_page": page,
+                "students": [self.to_dict(student) for student in students],
+                "total": total,
+                "pages": -(-total // per_page),
+                "current_page": None if cursor else page,
                 "per_page": per_page,
+                "next_cursor": next_cursor,
             }
 
-            cache.set(cache_key, result)
             return result, 200
 
         except Exception as e:
-            return (None, 500, f"Error fetching students: {str(e)}")
+            return {"message": f"Error fetching students: {str(e)}"}, 500
 
     @jwt_required()
     @role_required("admin")
@@ -1,5 +1,5 @@
 from flask_restful import Resource
-from ..models import Subject, Chapter
+from ..models import Subject, Chapter, Quiz
 from flask_jwt_extended import jwt_required
 from ..utils import role_required, allowed_file
 from flask import request
@@ -8,8 +8,11 @@ import os
 from flask import current_app as app
 from werkzeug.utils import secure_filename
 from sqlalchemy import or_
-from .. import cache
-from time import perf_counter_ns
+from ..instrumentation import timing
+from ..response_cache import cached_response
+from ..cache_tags import invalidate_tags, results_changed
+from ..grading import bump_quiz_version
+from ..rollups import result_scope, refresh_rollups
 
 # create an image folder if it doesn't exists
 app_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -18,35 +21,36 @@ IMAGE_FOLDER = os.path.join(app_root, relative_path)
 os.makedirs(IMAGE_FOLDER, exist_ok=True)
 
 
+# Subjects are listed with chapter, quiz and student counts
+SUBJECT_TAGS = ["subjects", "chapters", "quizzes", "results"]
+
+
 class SubjectApi(Resource):
 
     def __init__(self):
         self.cache_timeout = 30
 
     def get_all_subjects(self):
-        start = perf_counter_ns()
-        subject_list = Subject.query.all()
-        end = perf_counter_ns()
-        print(f"Time taken to fetch subjects: {(end - start) / 1_000_000} ms")
-        return [subject.to_dict() for subject in subject_list]
+        with timing("fetch_subjects"):
+            subject_list = Subject.query.all()
+        return Subject.to_dict_many(subject_list)
 
-    @cache.memoize(timeout=30)
     def get_subject_by_id(self, subject_id):
         subject = Subject.query.get_or_404(subject_id)
         return subject.to_dict()
 
-    @cache.memoize(timeout=30)
     def search_subjects(self, search_query):
-        """Cached method to search subjects"""
+        """Search subjects by name or description"""
         subjects = Subject.query.filter(
             or_(
                 Subject.name.ilike(f"%{search_query}%"),
                 Subject.description.ilike(f"%{search_query}%"),
             )
         ).all()
-        return [subject.to_dict() for subject in subjects]
+        return Subject.to_dict_many(subjects)
 
     @jwt_required()
+    @cached_response(timeout=30, tags=SUBJECT_TAGS)
     def get(self, subject_id=None):
         try:
             search_query = request.args.get("search", "").lower()
@@ -54,13 +58,10 @@ class SubjectApi(Resource):
             if search_query:
                 return {"subjects": self.search_subjects(search_query)}
 
-            start = perf_counter_ns()
             if subject_id:
                 if not Subject.query.get(subject_id):
                     return {"message": "Subject not found"}, 404
                 return self.get_subject_by_id(subject_id)
-            end = perf_counter_ns()
-            print(f"Time taken to fetch subject: {(end - start) / 1_000_000} ms")
 
             return {"subjects": self.get_all_subjects()}
 
@@ -104,7 +105,7 @@ class SubjectApi(Resource):
             db.session.add(new_subject)
             db.session.commit()
 
-            self.invalidate_cache()
+            invalidate_tags("subjects")
             return (
                 {
                     "message": "Subject created successfully",
@@ -139,9 +140,21 @@ class SubjectApi(Resource):
                 except Exception as e:
                     print(f"Error removing image: {e}")
 
+            # Chapters, quizzes and their results go with the subject
+            quiz_ids = [
+                row[0]
+                for row in db.session.query(Quiz.id)
+                .join(Chapter, Chapter.id == Quiz.chapter_id)
+                .filter(Chapter.subject_id == subject_id)
+            ]
+            scope = result_scope(Chapter.subject_id == subject_id)
             db.session.delete(subject)
+            db.session.flush()
+            refresh_rollups(scope)
             db.session.commit()
-            self.invalidate_cache()
+            invalidate_tags("subjects", "chapters")
+            results_changed(*scope.user_ids)
+            bump_quiz_version(*quiz_ids)
 
             return {
                 "message": "Subject deleted successfully",
@@ -159,7 +172,6 @@ class SubjectApi(Resource):
     @jwt_required()
     @role_required("admin")
     def put(self, subject_id):
-        cache.clear()
         try:
             subject = Subject.query.get_or_404(subject_id)
 
@@ -224,7 +236,7 @@ class SubjectApi(Resource):
                 subject.subject_image = None
 
             db.session.commit()
-            self.invalidate_cache()
+            invalidate_tags("subjects")
             return subject.to_dict(), 200
 
         except Exception as e:
@@ -235,9 +247,3 @@ class SubjectApi(Resource):
                 "error": str(e),
                 "error_type": type(e).__name__,
             }, 400
-
-    def invalidate_cache(self):
-        """Invalidate all subject-related caches"""
-        cache.delete_memoized(self.get_all_subjects)
-        cache.delete_memoized(self.get_subject_by_id)
-        cache.delete_memoized(self.search_subjects)
@@ -4,6 +4,7 @@ from ..utils import allowed_file
 from ..models import User
 from flask import request
 from .. import db
+from .student import invalidate_student
 import os
 from flask import current_app as app
 from werkzeug.utils import secure_filename
@@ -82,6 +83,7 @@ class UserApi(Resource):
                 user.profile_pic = None
 
             db.session.commit()
+            invalidate_student(user.id)
 
             # Prepare response
             response_data = {
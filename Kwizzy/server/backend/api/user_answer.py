@@ -1,11 +1,13 @@
 # user_answer_api.py
 from flask_restful import Resource
-from ..models import UserAnswer, QuizResult, Question, Option, Quiz
+from ..models import UserAnswer, Quiz
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask import request
-from .. import db, cache
-from time import perf_counter_ns
-from ..utils import IndianTimeZone
+from .. import db
+from ..grading import AnswerKey
+from ..submissions import record_submission
+from ..cache_tags import results_changed
+from .student import invalidate_student
 
 
 class UserAnswerApi(Resource):
@@ -55,71 +57,29 @@ class UserAnswerApi(Resource):
                     }
                 ), 403
 
-            # Calculate results
-            total_questions = len(quiz.questions)
-            correct_answers = 0
-            user_answers = []
-            completed = IndianTimeZone()
-            print("Completed at:", completed)
-            print("hi")
-
-            # Process each answer
-            for answer in data["answers"]:
-                question_id = answer.get("question_id")
-                selected_option_id = answer.get("selected_option_id")
-
-                if not question_id or not selected_option_id:
-                    continue
-
-                # Get the correct option for this question
-                question = Question.query.get(question_id)
-                if not question or question.quiz_id != quiz.id:
-                    return {"message": f"Invalid question_id: {question_id}"}, 400
-
-                correct_option = Option.query.filter_by(
-                    question_id=question_id, is_correct=True
-                ).first()
-
-                is_correct = correct_option and correct_option.id == selected_option_id
-                if is_correct:
-                    correct_answers += 1
-
-                user_answers.append(
-                    {
-                        "question_id": question_id,
-                        "selected_option": selected_option_id,
-                        "is_correct": is_correct,
-                    }
-                )
+            # Grade all answers in memory against the quiz's answer key
+            answer_key = AnswerKey.for_quiz(quiz.id)
+            total_questions = answer_key.total_questions
+            try:
+                user_answers, correct_answers = answer_key.grade(data["answers"])
+            except ValueError as e:
+                return {"message": str(e)}, 400
 
             # Calculate percentage
             percentage = (
                 (correct_answers / total_questions) * 100 if total_questions > 0 else 0
             )
 
-            # Create quiz result
-            quiz_result = QuizResult(
+            # Write the quiz result and its answers in one batch
+            result_id, completed_at = record_submission(
                 quiz_id=quiz.id,
                 user_id=user_id,
                 marks_scored=correct_answers,
                 total_marks=total_questions,
-                completed_at=IndianTimeZone(),
+                answers=user_answers,
             )
-
-            db.session.add(quiz_result)
-            db.session.flush()  # Get the ID of quiz_result
-
-            # Create user answers
-            for answer in user_answers:
-                user_answer = UserAnswer(
-                    result_id=quiz_result.id,
-                    question_id=answer["question_id"],
-                    selected_option=answer["selected_option"],
-                    is_correct=answer["is_correct"],
-                )
-                db.session.add(user_answer)
-
             db.session.commit()
+            results_changed(user_id)
 
             # Prepare detailed result response
             result = {
@@ -130,8 +90,8 @@ class UserAnswerApi(Resource):
                 "marks_scored": correct_answers,
                 "total_marks": total_questions,
                 "percentage": round(percentage, 2),
-                "result_id": quiz_result.id,
-                "completed_at_formatted": quiz_result.completed_at.strftime(
+                "result_id": result_id,
+                "completed_at_formatted": completed_at.strftime(
                     "%d-%m-%Y %I:%M:%S %p IST"
                 ),  # Add formatted date
                 "user_answers": [  # Rename detailed_answers to user_answers for consistency
@@ -140,11 +100,9 @@ class UserAnswerApi(Resource):
                         "question_id": answer["question_id"],
                         "selected_option": answer["selected_option"],
                         "is_correct": answer["is_correct"],
-                        "correct_option": Option.query.filter_by(
-                            question_id=answer["question_id"], is_correct=True
-                        )
-                        .first()
-                        .id,
+                        "correct_option": answer_key.correct_option(
+                            answer["question_id"]
+                        ),
                     }
                     for idx, answer in enumerate(user_answers)
                 ],
@@ -175,7 +133,7 @@ class UserAnswerApi(Resource):
                 answer.is_correct = data["is_correct"]
 
             db.session.commit()
-            self.invalidate_cache()
+            invalidate_student(user_id)
 
             return answer.to_dict(), 200
 
@@ -195,28 +153,10 @@ class UserAnswerApi(Resource):
 
             db.session.delete(answer)
             db.session.commit()
-            self.invalidate_cache()
+            invalidate_student(user_id)
 
             return {"message": "Answer deleted successfully"}, 200
 
         except Exception as e:
             db.session.rollback()
             return {"message": str(e)}, 400
-
-    def invalidate_cache(self):
-        """Invalidate all user answer related caches"""
-        cache.delete_memoized(self.get_user_answer_by_id)
-        cache.delete_memoized(self.get_result_answers)
-
-    def get_question_details(self, question_id):
-        """Helper method to get question details including correct answer"""
-        question = Question.query.get_or_404(question_id)
-        correct_option = Option.query.filter_by(
-            question_id=question_id, is_correct=True
-        ).first()
-
-        return {
-            "question_text": question.text,
-            "correct_option_id": correct_option.id if correct_option else None,
-            "correct_option_text": correct_option.text if correct_option else None,
-        }
@@ -0,0 +1,46 @@
+from uuid import uuid4
+from . import cache
+
+
+def tag_key(tag):
+    return f"tag_version:{tag}"
+
+
+def _new_version():
+    return uuid4().hex[:12]
+
+
+def tag_versions(*tags):
+    """
+    Current version token of each tag, in order. Entries built from data
+    under a tag put its token in their cache key, so changing the token
+    (invalidate_tags) makes them unreachable without deleting anything.
+    """
+    if not tags:
+        return []
+    versions = cache.get_many(*[tag_key(tag) for tag in tags])
+    for index, tag in enumerate(tags):
+        if versions[index] is None:
+            # A missing token (never set or evicted) always yields a fresh
+            # one, so entries cached under an older token are never served
+            cache.add(tag_key(tag), _new_version(), timeout=0)
+            versions[index] = cache.get(tag_key(tag)) or _new_version()
+    return versions
+
+
+def invalidate_tags(*tags):
+    """Give each tag a new version, retiring everything cached under it"""
+    if tags:
+        cache.set_many({tag_key(tag): _new_version() for tag in tags}, timeout=0)
+
+
+def results_changed(*user_ids):
+    """
+    Retire cached responses built from quiz results, after results of these
+    students were added or removed (directly, or by deleting the quiz,
+    chapter or subject they belong to): the student list and pages, and
+    everything tagged "results" such as the subject statistics
+    """
+    invalidate_tags(
+        "results", "students:list", *[f"student:{user_id}" for user_id in user_ids]
+    )
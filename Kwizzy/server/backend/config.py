@@ -15,4 +15,12 @@ class Config:
     MAIL_SERVER = os.getenv("MAIL_SERVER")
     MAIL_PORT = os.getenv("MAIL_PORT")
     MAIL_USE_TLS = os.getenv("MAIL_USE_TLS")
-    MAIL_USERNAME = os.getenv("MAIL_USERNAME")
\ No newline at end of file
+    MAIL_USERNAME = os.getenv("MAIL_USERNAME")
+    # Per-request SQL instrumentation, see backend/instrumentation.py
+    SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "false").lower() == "true"
+    SQL_SLOWEST_STATEMENTS = int(os.getenv("SQL_SLOWEST_STATEMENTS", 3))
+    SQL_QUERY_WARN_THRESHOLD = int(os.getenv("SQL_QUERY_WARN_THRESHOLD", 30))
+    # Prometheus metrics at /metrics, see backend/metrics.py. Scrapers must
+    # send "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
@@ -0,0 +1,58 @@
+from . import db, cache
+from .models import PaymentHistory, Quiz
+
+ENTITLEMENT_TIMEOUT = 3600
+
+
+def entitlements_key(user_id):
+    return f"paid_quizzes:{user_id}"
+
+
+def load_paid_quizzes(user_id):
+    """Ids of every quiz the user has a completed payment for"""
+    rows = (
+        db.session.query(PaymentHistory.quiz_id)
+        .filter(PaymentHistory.user_id == user_id, PaymentHistory.status == "completed")
+        .distinct()
+    )
+    return frozenset(row[0] for row in rows)
+
+
+def get_paid_quizzes(user_id):
+    """
+    The user's paid quiz ids, read from payment_history once and then served
+    from the cache until a new payment refreshes it
+    """
+    paid = cache.get(entitlements_key(int(user_id)))
+    if paid is None:
+        paid = refresh_paid_quizzes(user_id)
+    return paid
+
+
+def refresh_paid_quizzes(user_id):
+    """Reload a user's entitlements after their payments change"""
+    paid = load_paid_quizzes(int(user_id))
+    cache.set(entitlements_key(int(user_id)), paid, timeout=ENTITLEMENT_TIMEOUT)
+    return paid
+
+
+def has_paid(user_id, quiz_id):
+    return int(quiz_id) in get_paid_quizzes(user_id)
+
+
+def quiz_access(user_id, quiz_ids):
+    """
+    Access flags for many quizzes in one go: {quiz_id: {"price", "has_paid",
+    "has_access"}}. Free quizzes are always accessible; unknown ids are left
+    out.
+    """
+    paid = get_paid_quizzes(user_id)
+    prices = db.session.query(Quiz.id, Quiz.price).filter(Quiz.id.in_(quiz_ids))
+    return {
+        quiz_id: {
+            "price": price,
+            "has_paid": quiz_id in paid,
+            "has_access": not price or quiz_id in paid,
+        }
+        for quiz_id, price in prices
+    }
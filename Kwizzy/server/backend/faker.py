@@ -126,10 +126,17 @@ def seed_quiz_results(users, quizzes):
 
 
 def seed_user_answers(quiz_results, questions, options):
+    # Group once so each result only looks at its own quiz's questions
+    questions_by_quiz = {}
+    for question in questions:
+        questions_by_quiz.setdefault(question.quiz_id, []).append(question)
+    options_by_question = {}
+    for option in options:
+        options_by_question.setdefault(option.question_id, []).append(option)
+
     for result in quiz_results:
-        quiz_questions = [q for q in questions if q.quiz_id == result.quiz_id]
-        for question in quiz_questions:
-            question_options = [o for o in options if o.question_id == question.id]
+        for question in questions_by_quiz.get(result.quiz_id, []):
+            question_options = options_by_question.get(question.id, [])
             if question_options:
                 selected_option = random.choice(question_options)
                 answer = UserAnswer(
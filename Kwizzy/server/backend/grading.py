@@ -0,0 +1,123 @@
+from sqlalchemy import and_
+from . import db, cache
+from .models import Question, Option
+from .cache_tags import tag_versions, invalidate_tags
+
+ANSWER_KEY_TIMEOUT = 3600
+
+
+def quiz_tag(quiz_id):
+    return f"quiz:{quiz_id}"
+
+
+def get_quiz_version(quiz_id):
+    """Return the current content version token of a quiz"""
+    return tag_versions(quiz_tag(quiz_id))[0]
+
+
+def bump_quiz_version(*quiz_ids):
+    """
+    Mark quizzes' questions/options as changed, which also retires the cached
+    quiz lists showing them
+    """
+    invalidate_tags(*[quiz_tag(quiz_id) for quiz_id in quiz_ids], "quizzes")
+
+
+class AnswerKey:
+    """Question ids and correct option ids of a single quiz"""
+
+    def __init__(self, quiz_id, question_ids, correct_options):
+        self.quiz_id = quiz_id
+        self.question_ids = question_ids
+        self.correct_options = correct_options
+
+    @classmethod
+    def load(cls, quiz_id):
+        """Build the answer key with a single query"""
+        rows = (
+            db.session.query(Question.id, Option.id)
+            .outerjoin(
+                Option,
+                and_(Option.question_id == Question.id, Option.is_correct == True),
+            )
+            .filter(Question.quiz_id == quiz_id)
+            .order_by(Question.id, Option.id)
+            .all()
+        )
+
+        question_ids = []
+        correct_options = {}
+        for question_id, option_id in rows:
+            if question_id not in correct_options:
+                question_ids.append(question_id)
+                correct_options[question_id] = []
+            if option_id is not None:
+                correct_options[question_id].append(option_id)
+
+        return cls(quiz_id, question_ids, correct_options)
+
+    @classmethod
+    def for_quiz(cls, quiz_id):
+        """Get the answer key from cache, loading it on a miss"""
+        cache_key = f"answer_key:{quiz_id}:{get_quiz_version(quiz_id)}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cls(quiz_id, cached["question_ids"], cached["correct_options"])
+
+        answer_key = cls.load(quiz_id)
+        cache.set(
+            cache_key,
+            {
+                "question_ids": answer_key.question_ids,
+                "correct_options": answer_key.correct_options,
+            },
+            timeout=ANSWER_KEY_TIMEOUT,
+        )
+        return answer_key
+
+    @property
+    def total_questions(self):
+        return len(self.question_ids)
+
+    def has_question(self, question_id):
+        return question_id in self.correct_options
+
+    def correct_option(self, question_id):
+        """First correct option of a question, None if it has none"""
+        options = self.correct_options.get(question_id)
+        return options[0] if options else None
+
+    def is_correct(self, question_id, selected_option_id):
+        return selected_option_id in self.correct_options.get(question_id, ())
+
+    def grade(self, answers):
+        """
+        Grade submitted answers in memory.
+        Returns (graded answers, number of correct answers) and raises
+        ValueError if an answer references a question outside the quiz.
+        """
+        graded = []
+        correct_answers = 0
+        for answer in answers:
+            question_id = answer.get("question_id")
+            selected_option_id = answer.get("selected_option_id")
+
+            if not question_id or not selected_option_id:
+                continue
+
+            if not self.has_question(question_id):
+                raise ValueError(f"Invalid question_id: {question_id}")
+
+            is_correct = self.is_correct(question_id, selected_option_id)
+            if is_correct:
+                correct_answers += 1
+
+            graded.append(
+                {
+                    "question_id": question_id,
+                    "selected_option": selected_option_id,
+                    "is_correct": is_correct,
+                }
+            )
+
+        return graded, correct_answers
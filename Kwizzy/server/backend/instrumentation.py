@@ -0,0 +1,143 @@
+"""
+Per-request SQL instrumentation.
+
+When SQL_INSTRUMENTATION is enabled, every statement executed while handling
+a request is counted and timed through SQLAlchemy engine events. The totals
+are returned in a Server-Timing header (visible in the browser's network
+panel) and written as one structured log line per request, along with the
+slowest statements. Requests issuing more than SQL_QUERY_WARN_THRESHOLD
+statements are logged as warnings, which is where N+1 patterns show up.
+"""
+import heapq
+import json
+import logging
+from contextlib import contextmanager
+from time import perf_counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_PREVIEW = 300
+
+
+class RequestProfile:
+    """Statement and timing totals for a single request"""
+
+    def __init__(self, keep_slowest):
+        self.started = perf_counter()
+        self.query_count = 0
+        self.db_ms = 0.0
+        self.keep_slowest = keep_slowest
+        self.slowest = []
+        self.timings = []
+
+    def add_statement(self, statement, elapsed_ms):
+        self.query_count += 1
+        self.db_ms += elapsed_ms
+        entry = (elapsed_ms, self.query_count, statement[:STATEMENT_PREVIEW])
+        if len(self.slowest) < self.keep_slowest:
+            heapq.heappush(self.slowest, entry)
+        elif self.slowest and elapsed_ms > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def total_ms(self):
+        return (perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        metrics = [
+            f'db;dur={self.db_ms:.2f};desc="{self.query_count} queries"',
+            f"total;dur={self.total_ms():.2f}",
+        ]
+        metrics.extend(f"{name};dur={ms:.2f}" for name, ms in self.timings)
+        return ", ".join(metrics)
+
+    def to_dict(self):
+        return {
+            "query_count": self.query_count,
+            "db_ms": round(self.db_ms, 2),
+            "total_ms": round(self.total_ms(), 2),
+            "timings": {name: round(ms, 2) for name, ms in self.timings},
+            "slowest": [
+                {"ms": round(ms, 2), "statement": statement}
+                for ms, _, statement in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+def current_profile():
+    """The profile of the request being handled, or None"""
+    if not has_request_context():
+        return None
+    return g.get("sql_profile")
+
+
+@contextmanager
+def timing(name):
+    """
+    Time a block of a request handler and report it as its own Server-Timing
+    metric. Does nothing when instrumentation is off.
+    """
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        profile.timings.append((name, (perf_counter() - start) * 1000))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile() is not None:
+        conn.info.setdefault("query_started", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    started = conn.info.get("query_started")
+    if profile is None or not started:
+        return
+    profile.add_statement(statement, (perf_counter() - started.pop()) * 1000)
+
+
+def init_instrumentation(app):
+    """Register the engine listeners and request hooks if enabled in config"""
+    if not app.config.get("SQL_INSTRUMENTATION"):
+        return
+
+    keep_slowest = app.config.get("SQL_SLOWEST_STATEMENTS", 3)
+    warn_threshold = app.config.get("SQL_QUERY_WARN_THRESHOLD", 30)
+
+    # Listening on the Engine class covers every engine the app creates
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def start_profile():
+        g.sql_profile = RequestProfile(keep_slowest)
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop("sql_profile", None)
+        if profile is None:
+            return response
+
+        response.headers["Server-Timing"] = profile.server_timing()
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            **profile.to_dict(),
+        }
+        level = (
+            logging.WARNING
+            if profile.query_count > warn_threshold
+            else logging.INFO
+        )
+        logger.log(level, json.dumps(record))
+        return response
@@ -0,0 +1,211 @@
+"""
+Prometheus metrics served from /metrics.
+
+Request latency is observed in-process per flask_restful resource, which
+costs one histogram update per request. Everything else is read when the
+endpoint is scraped: database pool usage from the engine, and Celery queue
+depth and task durations from Redis. Workers run in their own processes, so
+task timings are aggregated in the broker's Redis by the task signals below
+rather than held in memory.
+
+The endpoint is off unless METRICS_ENABLED is set, and then only answers
+requests carrying "Authorization: Bearer <METRICS_TOKEN>".
+"""
+
+import hmac
+import logging
+from time import perf_counter
+import redis
+from celery.signals import task_prerun, task_postrun
+from flask import Response, abort, current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
+from . import db, cache, celery
+
+logger = logging.getLogger(__name__)
+
+registry = CollectorRegistry()
+
+REQUEST_LATENCY = Histogram(
+    "kwizzy_request_duration_seconds",
+    "API request latency by resource",
+    ["resource", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    registry=registry,
+)
+CACHE_REQUESTS = Counter(
+    "kwizzy_cache_requests_total",
+    "Flask-Caching lookups by result",
+    ["result"],
+    registry=registry,
+)
+RESPONSE_CACHE_REQUESTS = Counter(
+    "kwizzy_response_cache_requests_total",
+    "Cached API responses served (hit) or rebuilt (miss), by resource",
+    ["resource", "result"],
+    registry=registry,
+)
+
+TASK_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300, 900)
+TASK_METRICS_KEY = "metrics:celery_tasks"
+CELERY_QUEUES = ("celery",)
+
+_broker = None
+
+
+def broker_client():
+    """Shared connection to the Celery broker's Redis"""
+    global _broker
+    if _broker is None:
+        _broker = redis.Redis.from_url(celery.conf.broker_url)
+    return _broker
+
+
+def resource_name():
+    """Name of the flask_restful resource class serving the request"""
+    view = current_app.view_functions.get(request.endpoint)
+    view_class = getattr(view, "view_class", None)
+    if view_class is not None:
+        return view_class.__name__
+    return request.endpoint or "unmatched"
+
+
+class DatabasePoolCollector:
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        with self.app.app_context():
+            pool = db.engine.pool
+        for name, description in (
+            ("size", "Configured pool size"),
+            ("checkedout", "Connections in use"),
+            ("checkedin", "Idle connections in the pool"),
+            ("overflow", "Connections opened beyond the pool size"),
+        ):
+            # Not every pool class (e.g. SQLite's StaticPool) reports usage
+            if hasattr(pool, name):
+                yield GaugeMetricFamily(
+                    f"kwizzy_db_pool_{name}", description, value=getattr(pool, name)()
+                )
+
+
+class CeleryCollector:
+    def collect(self):
+        try:
+            client = broker_client()
+            depths = {queue: client.llen(queue) for queue in CELERY_QUEUES}
+            stats = client.hgetall(TASK_METRICS_KEY)
+        except redis.RedisError as e:
+            logger.warning(f"Could not read Celery metrics: {e}")
+            return
+
+        queue_depth = GaugeMetricFamily(
+            "kwizzy_celery_queue_depth",
+            "Messages waiting in the queue",
+            labels=["queue"],
+        )
+        for queue, depth in depths.items():
+            queue_depth.add_metric([queue], depth)
+        yield queue_depth
+
+        # Fields are "<task>|count", "<task>|sum" and "<task>|le|<bucket>"
+        tasks = {}
+        for field, value in stats.items():
+            task, _, rest = field.decode().partition("|")
+            tasks.setdefault(task, {})[rest] = float(value)
+
+        durations = HistogramMetricFamily(
+            "kwizzy_celery_task_duration_seconds",
+            "Celery task run time",
+            labels=["task"],
+        )
+        for task, fields in sorted(tasks.items()):
+            cumulative = 0
+            buckets = []
+            for bound in TASK_BUCKETS:
+                cumulative += fields.get(f"le|{bound}", 0)
+                buckets.append((str(bound), cumulative))
+            buckets.append(("+Inf", fields.get("count", 0)))
+            durations.add_metric([task], buckets, fields.get("sum", 0))
+        yield durations
+
+
+def _count_cache_lookups(backend):
+    """Wrap a cache backend's get so every lookup counts as a hit or a miss"""
+    get = backend.get
+
+    def counted_get(*args, **kwargs):
+        value = get(*args, **kwargs)
+        CACHE_REQUESTS.labels("miss" if value is None else "hit").inc()
+        return value
+
+    backend.get = counted_get
+
+
+def _task_started(task_id=None, task=None, **kwargs):
+    if task is not None:
+        task.request.metrics_started = perf_counter()
+
+
+def _task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = getattr(task.request, "metrics_started", None) if task else None
+    if started is None:
+        return
+    elapsed = perf_counter() - started
+    bucket = next((b for b in TASK_BUCKETS if elapsed <= b), None)
+    try:
+        pipe = broker_client().pipeline(transaction=False)
+        pipe.hincrby(TASK_METRICS_KEY, f"{task.name}|count", 1)
+        pipe.hincrbyfloat(TASK_METRICS_KEY, f"{task.name}|sum", elapsed)
+        if bucket is not None:
+            pipe.hincrby(TASK_METRICS_KEY, f"{task.name}|le|{bucket}", 1)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not record metrics for {task.name}: {e}")
+
+
+def init_metrics(app):
+    """Register the request hooks, collectors and the /metrics endpoint"""
+    if not app.config.get("METRICS_ENABLED"):
+        return
+    token = app.config.get("METRICS_TOKEN")
+    if not token:
+        # The endpoint exposes pool, queue and cache internals, so it is never
+        # served without a token
+        logger.warning("METRICS_ENABLED is set without METRICS_TOKEN; /metrics is off")
+        return
+
+    registry.register(DatabasePoolCollector(app))
+    registry.register(CeleryCollector())
+    _count_cache_lookups(app.extensions["cache"][cache])
+    # Workers create the app too, so task timings are only written to Redis
+    # when metrics are on
+    task_prerun.connect(_task_started)
+    task_postrun.connect(_task_finished)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = perf_counter()
+
+    @app.after_request
+    def observe_latency(response):
+        started = g.pop("metrics_started", None)
+        if started is not None and request.endpoint != "metrics":
+            REQUEST_LATENCY.labels(
+                resource_name(), request.method, response.status_code
+            ).observe(perf_counter() - started)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        supplied = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+            abort(401)
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -7,29 +7,106 @@ from sqlalchemy import (
     Integer,
     String,
     Boolean,
+    Float,
     ForeignKey,
+    Index,
+    DDL,
+    and_,
+    or_,
+    event,
 )
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import relationship
 from flask_login import UserMixin
 from . import db
 from .utils import IndianTimeZone, convert_to_ist, format_ist_datetime
 from datetime import datetime
+import sqlite3
 
 
 class User(db.Model, UserMixin):
     __tablename__ = "users"
+    # Keyset pagination of the student directory (name and email already
+    # have unique indexes)
+    __table_args__ = (
+        Index("ix_users_role_qualification_id", "role", "qualification", "id"),
+        Index("ix_users_role_dob_id", "role", "dob", "id"),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(50), nullable=False, unique=True)
     email = Column(String(50), nullable=False, unique=True)
     dob = Column(Date, nullable=False)
     qualification = Column(String(50), nullable=False)
-    role = Column(String(10), nullable=False, default="student")
+    role = Column(String(10), nullable=False, default="student", index=True)
     profile_pic = Column(String(255), nullable=True)
     password = Column(String(30), nullable=False)
 
     quiz_results = relationship(
         "QuizResult", back_populates="user", cascade="all, delete-orphan"
     )
+    score_rollup = relationship("UserScoreRollup", uselist=False, viewonly=True)
+
+
+# Substring search over name, email and qualification (see
+# student_directory.py). SQLite gets an FTS5 trigram table kept in sync by
+# triggers; Postgres gets pg_trgm GIN indexes that ILIKE '%term%' can use.
+# SQLite builds without FTS5 or older than 3.34 (no trigram tokenizer) get
+# no search table and fall back to LIKE.
+USER_SEARCH_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5("
+        "name, email, qualification, content='users', content_rowid='id', "
+        "tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS users_search_insert AFTER INSERT ON users "
+        "BEGIN INSERT INTO users_search(rowid, name, email, qualification) "
+        "VALUES (new.id, new.name, new.email, new.qualification); END",
+        "CREATE TRIGGER IF NOT EXISTS users_search_delete AFTER DELETE ON users "
+        "BEGIN INSERT INTO users_search(users_search, rowid, name, email, "
+        "qualification) VALUES ('delete', old.id, old.name, old.email, "
+        "old.qualification); END",
+        "CREATE TRIGGER IF NOT EXISTS users_search_update AFTER UPDATE ON users "
+        "BEGIN INSERT INTO users_search(users_search, rowid, name, email, "
+        "qualification) VALUES ('delete', old.id, old.name, old.email, "
+        "old.qualification); INSERT INTO users_search(rowid, name, email, "
+        "qualification) VALUES (new.id, new.name, new.email, new.qualification); "
+        "END",
+    ],
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_users_name_trgm "
+        "ON users USING gin (name gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_users_email_trgm "
+        "ON users USING gin (email gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_users_qualification_trgm "
+        "ON users USING gin (qualification gin_trgm_ops)",
+    ],
+}
+
+
+def sqlite_has_trigram(connection):
+    """Whether this SQLite build can create FTS5 tables with the trigram tokenizer"""
+    if sqlite3.sqlite_version_info < (3, 34, 0):
+        return False
+    try:
+        connection.exec_driver_sql(
+            "CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(a, tokenize='trigram')"
+        )
+    except OperationalError:
+        return False
+    connection.exec_driver_sql("DROP TABLE temp.trigram_probe")
+    return True
+
+
+def _has_trigram(ddl, target, bind, **kw):
+    return sqlite_has_trigram(bind)
+
+
+for dialect, statements in USER_SEARCH_DDL.items():
+    for statement in statements:
+        ddl = DDL(statement).execute_if(
+            dialect=dialect, callable_=_has_trigram if dialect == "sqlite" else None
+        )
+        event.listen(User.__table__, "after_create", ddl)
 
 
 class Subject(db.Model):
@@ -40,26 +117,58 @@ class Subject(db.Model):
     subject_image = Column(String(255), nullable=True)
 
     def to_dict(self):
-        quiz_count = sum(len(chapter.quizzes) for chapter in self.chapters)
-        # Counting the number of distinct students who have attempted quizzes
-        # We join QuizResults with Quizzes, which are linked to Chapters
-        student_attempted_count = (
-            db.session.query(func.count(func.distinct(QuizResult.user_id)))
-            .join(Quiz, Quiz.id == QuizResult.quiz_id)
-            .join(Chapter, Chapter.id == Quiz.chapter_id)
-            .filter(Chapter.subject_id == self.id)
-            .scalar()
-        )
-        chapter_count = len(self.chapters)
-        return {
-            "id": self.id,
-            "name": self.name,
-            "description": self.description,
-            "subject_image": self.subject_image,
-            "quiz_count": quiz_count,
-            "students": student_attempted_count,
-            "chapters": chapter_count,
-        }
+        return Subject.to_dict_many([self])[0]
+
+    @staticmethod
+    def to_dict_many(subjects):
+        """
+        Serialize many subjects with three grouped count queries, no matter
+        how many subjects are passed in
+        """
+        subject_ids = [subject.id for subject in subjects if subject.id is not None]
+
+        chapter_counts = {}
+        quiz_counts = {}
+        student_counts = {}
+        if subject_ids:
+            chapter_counts = dict(
+                db.session.query(Chapter.subject_id, func.count(Chapter.id))
+                .filter(Chapter.subject_id.in_(subject_ids))
+                .group_by(Chapter.subject_id)
+                .all()
+            )
+            quiz_counts = dict(
+                db.session.query(Chapter.subject_id, func.count(Quiz.id))
+                .join(Quiz, Quiz.chapter_id == Chapter.id)
+                .filter(Chapter.subject_id.in_(subject_ids))
+                .group_by(Chapter.subject_id)
+                .all()
+            )
+            # Counting the number of distinct students who have attempted quizzes
+            # We join QuizResults with Quizzes, which are linked to Chapters
+            student_counts = dict(
+                db.session.query(
+                    Chapter.subject_id, func.count(func.distinct(QuizResult.user_id))
+                )
+                .join(Quiz, Quiz.id == QuizResult.quiz_id)
+                .join(Chapter, Chapter.id == Quiz.chapter_id)
+                .filter(Chapter.subject_id.in_(subject_ids))
+                .group_by(Chapter.subject_id)
+                .all()
+            )
+
+        return [
+            {
+                "id": subject.id,
+                "name": subject.name,
+                "description": subject.description,
+                "subject_image": subject.subject_image,
+                "quiz_count": quiz_counts.get(subject.id, 0),
+                "students": student_counts.get(subject.id, 0),
+                "chapters": chapter_counts.get(subject.id, 0),
+            }
+            for subject in subjects
+        ]
 
     chapters = relationship(
         "Chapter", back_populates="subject", cascade="all, delete-orphan"
@@ -72,7 +181,10 @@ class Chapter(db.Model):
     name = Column(String(50), nullable=False)
 
     subject_id = Column(
-        Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False
+        Integer,
+        ForeignKey("subjects.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
     )
     description = Column(String(120), nullable=False)
 
@@ -99,7 +211,10 @@ class Quiz(db.Model):
     description = Column(String(120), nullable=False)
     price = Column(Integer, nullable=False, default=0)
     chapter_id = Column(
-        Integer, ForeignKey("chapters.id", ondelete="CASCADE"), nullable=False
+        Integer,
+        ForeignKey("chapters.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
     )
     time_duration = Column(Integer, nullable=False, default=0)
     deadline = Column(DateTime, nullable=True)
@@ -117,12 +232,9 @@ class Quiz(db.Model):
     )
 
     def has_user_paid(self, user_id):
-        return (
-            PaymentHistory.query.filter_by(
-                user_id=user_id, quiz_id=self.id, status="completed"
-            ).first()
-            is not None
-        )
+        from .entitlements import has_paid
+
+        return has_paid(user_id, self.id)
 
     def is_available(self):
         """Check if quiz is available based on deadline"""
@@ -161,7 +273,10 @@ class Question(db.Model):
     __tablename__ = "questions"
     id = Column(Integer, primary_key=True, autoincrement=True)
     quiz_id = Column(
-        Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), nullable=False
+        Integer,
+        ForeignKey("quizzes.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
     )
     title = Column(String(100), nullable=True)
     text = Column(String(255), nullable=False)
@@ -174,6 +289,9 @@ class Question(db.Model):
 
 class Option(db.Model):
     __tablename__ = "options"
+    __table_args__ = (
+        Index("ix_options_question_id_is_correct", "question_id", "is_correct"),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     question_id = Column(
         Integer, ForeignKey("questions.id", ondelete="CASCADE"), nullable=False
@@ -189,7 +307,10 @@ class UserAnswer(db.Model):
     __tablename__ = "user_answers"
     id = Column(Integer, primary_key=True, autoincrement=True)
     result_id = Column(
-        Integer, ForeignKey("quiz_results.id", ondelete="CASCADE"), nullable=False
+        Integer,
+        ForeignKey("quiz_results.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
     )
     question_id = Column(
         Integer, ForeignKey("questions.id", ondelete="CASCADE"), nullable=False
@@ -252,6 +373,10 @@ class UserAnswer(db.Model):
 # ||----------------------Quiz Result Model----------------------||#
 class QuizResult(db.Model):
     __tablename__ = "quiz_results"
+    __table_args__ = (
+        Index("ix_quiz_results_user_id_quiz_id", "user_id", "quiz_id"),
+        Index("ix_quiz_results_user_id_completed_at", "user_id", "completed_at"),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     quiz_id = Column(
         Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), nullable=False
@@ -271,17 +396,7 @@ class QuizResult(db.Model):
 
     def to_dict(self):
         try:
-            return {
-                "id": self.id,
-                "quiz_id": self.quiz_id,
-                "user_id": self.user_id,
-                "marks_scored": self.marks_scored,
-                "total_marks": self.total_marks,
-                "completed_at_formatted": format_ist_datetime(self.completed_at),
-                "user_answers": [answer.to_dict() for answer in self.user_answers],
-                "quiz_name": self.quiz.name if self.quiz else None,
-                "quiz_description": self.quiz.description if self.quiz else None,
-            }
+            return QuizResult.to_dict_many([self])[0]
         except Exception as e:
             print(f"Error in QuizResult.to_dict(): {str(e)}")
             return {
@@ -296,9 +411,124 @@ class QuizResult(db.Model):
                 "quiz_description": "Error loading quiz description",
             }
 
+    @staticmethod
+    def to_dict_many(results, include_answers=True):
+        """
+        Serialize many quiz results with their answers using a fixed number of
+        queries: answers, questions, options and quizzes are each fetched once
+        for the whole batch and joined up in memory. With include_answers=False
+        only the quiz names are looked up and user_answers is left out.
+        """
+        result_ids = [result.id for result in results]
+        if not result_ids:
+            return []
+
+        answers_by_result = {result_id: [] for result_id in result_ids}
+        answer_rows = []
+        if include_answers:
+            answer_rows = (
+                db.session.query(
+                    UserAnswer.id,
+                    UserAnswer.result_id,
+                    UserAnswer.question_id,
+                    UserAnswer.selected_option,
+                    UserAnswer.is_correct,
+                )
+                .filter(UserAnswer.result_id.in_(result_ids))
+                .order_by(UserAnswer.id)
+                .all()
+            )
+        for row in answer_rows:
+            answers_by_result[row.result_id].append(row)
+
+        question_ids = {row.question_id for row in answer_rows}
+        selected_ids = {
+            row.selected_option for row in answer_rows if row.selected_option
+        }
+
+        question_texts = {}
+        option_texts = {}
+        correct_option_texts = {}
+        if question_ids:
+            question_texts = dict(
+                db.session.query(Question.id, Question.text)
+                .filter(Question.id.in_(question_ids))
+                .all()
+            )
+            option_rows = (
+                db.session.query(
+                    Option.id, Option.question_id, Option.text, Option.is_correct
+                )
+                .filter(
+                    or_(
+                        Option.id.in_(selected_ids),
+                        and_(
+                            Option.question_id.in_(question_ids),
+                            Option.is_correct == True,
+                        ),
+                    )
+                )
+                .order_by(Option.id)
+                .all()
+            )
+            for option in option_rows:
+                option_texts[option.id] = option.text
+                if option.is_correct and option.question_id in question_ids:
+                    correct_option_texts.setdefault(option.question_id, option.text)
+
+        quizzes = {
+            quiz.id: quiz
+            for quiz in db.session.query(Quiz.id, Quiz.name, Quiz.description)
+            .filter(Quiz.id.in_({result.quiz_id for result in results}))
+            .all()
+        }
+
+        serialized = []
+        for result in results:
+            quiz = quizzes.get(result.quiz_id)
+            data = {
+                "id": result.id,
+                "quiz_id": result.quiz_id,
+                "user_id": result.user_id,
+                "marks_scored": result.marks_scored,
+                "total_marks": result.total_marks,
+                "completed_at_formatted": format_ist_datetime(result.completed_at),
+                "quiz_name": quiz.name if quiz else None,
+                "quiz_description": quiz.description if quiz else None,
+            }
+            if include_answers:
+                data["user_answers"] = [
+                    {
+                        "id": answer.id,
+                        "result_id": answer.result_id,
+                        "question_text": question_texts.get(
+                            answer.question_id, "Error loading question"
+                        ),
+                        "selected_option": answer.selected_option,
+                        "selected_option_text": option_texts.get(
+                            answer.selected_option, "No answer selected"
+                        ),
+                        "correct_option_text": correct_option_texts.get(
+                            answer.question_id, "No correct option found"
+                        ),
+                        "is_correct": answer.is_correct,
+                    }
+                    for answer in answers_by_result[result.id]
+                ]
+            serialized.append(data)
+        return serialized
+
 
 class PaymentHistory(db.Model):
     __tablename__ = "payment_history"
+    __table_args__ = (
+        Index(
+            "ix_payment_history_user_id_quiz_id_status",
+            "user_id",
+            "quiz_id",
+            "status",
+        ),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
@@ -319,3 +549,59 @@ class PaymentHistory(db.Model):
             "status": self.status,
             "created_at": format_ist_datetime(self.created_at),
         }
+
+
+# ||----------------------Rollup Models----------------------||#
+# Aggregates kept up to date as quiz results are written (see rollups.py), so
+# dashboards read a handful of rows instead of scanning quiz_results.
+class SubjectScoreRollup(db.Model):
+    __tablename__ = "subject_score_rollups"
+    subject_id = Column(
+        Integer, ForeignKey("subjects.id", ondelete="CASCADE"), primary_key=True
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    scored_attempts = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0)
+    student_count = Column(Integer, nullable=False, default=0)
+
+
+class UserScoreRollup(db.Model):
+    __tablename__ = "user_score_rollups"
+    # Sorting the student directory by performance or attempts
+    __table_args__ = (
+        Index("ix_user_score_rollups_performance_user_id", "performance", "user_id"),
+        Index("ix_user_score_rollups_attempts_user_id", "attempts", "user_id"),
+    )
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    scored_attempts = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0)
+    marks_scored_sum = Column(Integer, nullable=False, default=0)
+    total_marks_sum = Column(Integer, nullable=False, default=0)
+    # marks_scored_sum / total_marks_sum as a percentage, stored so it can be
+    # indexed
+    performance = Column(Float, nullable=False, default=0)
+    last_active = Column(DateTime, nullable=True, index=True)
+
+
+@event.listens_for(User, "after_insert")
+def create_score_rollup(mapper, connection, target):
+    """
+    Every student has a rollup row from the start (bulk inserts are covered
+    by rebuild_rollups); the directory still outer joins it, counting a
+    missing row as zeros
+    """
+    if target.role == "student":
+        connection.execute(
+            UserScoreRollup.__table__.insert().values(user_id=target.id)
+        )
+
+
+class DailyActivityRollup(db.Model):
+    __tablename__ = "daily_activity_rollups"
+    day = Column(Date, primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    scored_attempts = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0)
@@ -0,0 +1,76 @@
+from sqlalchemy import select, func, text
+from . import db
+from .models import (
+    User,
+    Chapter,
+    Quiz,
+    Question,
+    Option,
+    QuizResult,
+    UserAnswer,
+    PaymentHistory,
+)
+
+
+def hot_queries():
+    """Representative statements for the access paths every endpoint relies on"""
+    return {
+        "quiz_results by user and quiz": select(QuizResult.id).where(
+            QuizResult.user_id == 1, QuizResult.quiz_id == 1
+        ),
+        "quiz_results by user, latest first": select(QuizResult.id)
+        .where(QuizResult.user_id == 1)
+        .order_by(QuizResult.completed_at.desc())
+        .limit(10),
+        "correct options of a question": select(Option.id).where(
+            Option.question_id == 1, Option.is_correct == True
+        ),
+        "completed payment for user and quiz": select(PaymentHistory.id).where(
+            PaymentHistory.user_id == 1,
+            PaymentHistory.quiz_id == 1,
+            PaymentHistory.status == "completed",
+        ),
+        "questions of a quiz": select(Question.id).where(Question.quiz_id == 1),
+        "chapters of a subject": select(Chapter.id).where(Chapter.subject_id == 1),
+        "quizzes of a chapter": select(Quiz.id).where(Quiz.chapter_id == 1),
+        "students": select(func.count(User.id)).where(User.role == "student"),
+        "answers of a result": select(UserAnswer.id).where(UserAnswer.result_id == 1),
+    }
+
+
+def _is_full_scan(dialect_name, plan_line):
+    if dialect_name == "sqlite":
+        # e.g. "SCAN quiz_results" vs "SEARCH quiz_results USING INDEX ..."
+        return plan_line.startswith("SCAN ") and "USING" not in plan_line
+    return "Seq Scan" in plan_line
+
+
+def explain(statement):
+    """Return the query plan of a statement as a list of lines"""
+    dialect = db.engine.dialect
+    sql = str(
+        statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    )
+    if dialect.name == "sqlite":
+        rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return [row[-1] for row in rows]
+
+    # Small tables make the planner prefer sequential scans regardless of
+    # indexes, so ask whether an index path exists at all
+    db.session.execute(text("SET LOCAL enable_seqscan = off"))
+    rows = db.session.execute(text(f"EXPLAIN {sql}")).all()
+    return [row[0] for row in rows]
+
+
+def find_full_scans():
+    """Map each hot query that falls back to a full table scan to its plan"""
+    dialect_name = db.engine.dialect.name
+    offenders = {}
+    try:
+        for name, statement in hot_queries().items():
+            plan = explain(statement)
+            if any(_is_full_scan(dialect_name, line) for line in plan):
+                offenders[name] = plan
+    finally:
+        db.session.rollback()
+    return offenders
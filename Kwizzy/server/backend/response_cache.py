@@ -0,0 +1,77 @@
+"""
+Response caching for flask_restful resources.
+
+A cached response is keyed on the resource, its route arguments, the
+normalized query string and the caller's role (and identity, for responses
+that differ per user), so two requests share an entry only when they would
+get the same body. Each entry also depends on a set of tags, e.g.
+"student:5" or "students:list"; writers call invalidate_tags() after
+committing and every entry built under those tags stops being served (see
+cache_tags.py). Hits and misses are counted per resource in the
+kwizzy_response_cache_requests_total metric and reported in an X-Cache
+header.
+"""
+
+import hashlib
+import json
+from functools import wraps
+from flask import request
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from . import cache
+from .cache_tags import tag_versions
+from .metrics import RESPONSE_CACHE_REQUESTS
+
+
+def normalized_query():
+    """Query string as sorted (name, value) pairs, without empty values"""
+    return sorted(
+        (name, value.strip())
+        for name, values in request.args.lists()
+        for value in values
+        if value.strip()
+    )
+
+
+def response_key(resource, route_args, versions, per_user=False):
+    caller = [get_jwt().get("role"), get_jwt_identity() if per_user else None]
+    parts = [sorted(route_args.items()), normalized_query(), caller, versions]
+    digest = hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+    return f"response:{resource}:{digest}"
+
+
+def cached_response(timeout=30, tags=None, per_user=False):
+    """
+    Cache the successful responses of a Resource method. Goes below
+    @jwt_required, so authentication still runs on every request. `tags` is
+    the list of tags the response depends on, or a function of the route
+    arguments returning it; returning None leaves that request uncached.
+    """
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(self, **route_args):
+            entry_tags = tags(**route_args) if callable(tags) else tags or []
+            if entry_tags is None:
+                return fn(self, **route_args)
+
+            resource = type(self).__name__
+            versions = tag_versions(*entry_tags)
+            cache_key = response_key(resource, route_args, versions, per_user)
+
+            cached = cache.get(cache_key)
+            if cached is not None:
+                RESPONSE_CACHE_REQUESTS.labels(resource, "hit").inc()
+                return cached, 200, {"X-Cache": "HIT"}
+            RESPONSE_CACHE_REQUESTS.labels(resource, "miss").inc()
+
+            response = fn(self, **route_args)
+            if not isinstance(response, tuple):
+                response = (response, 200)
+            if len(response) == 2 and response[1] == 200:
+                cache.set(cache_key, response[0], timeout=timeout)
+                return response[0], 200, {"X-Cache": "MISS"}
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,342 @@
+from datetime import datetime
+from sqlalchemy import case, func, insert, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from . import db
+from .models import (
+    Chapter,
+    Quiz,
+    QuizResult,
+    User,
+    SubjectScoreRollup,
+    UserScoreRollup,
+    DailyActivityRollup,
+)
+
+
+def _latest(column, value):
+    """SQL expression picking the later of a stored datetime and a new one"""
+    return case(
+        (column.is_(None), value),
+        (value > column, value),
+        else_=column,
+    )
+
+
+def _percentage(scored, total):
+    return scored * 100.0 / total if total else 0.0
+
+
+def _upsert(model, keys, increments, latest=None):
+    """
+    Add increments to a rollup row, creating it if needed. Uses a native
+    INSERT .. ON CONFLICT where the backend has one, otherwise UPDATE and
+    fall back to INSERT.
+    """
+    latest = latest or {}
+    table = model.__table__
+    values = {**keys, **increments, **latest}
+
+    dialect_insert = {
+        "sqlite": sqlite.insert,
+        "postgresql": postgresql.insert,
+    }.get(db.engine.dialect.name)
+
+    if dialect_insert:
+        stmt = dialect_insert(table).values(**values)
+        set_ = {name: table.c[name] + stmt.excluded[name] for name in increments}
+        set_.update(
+            {name: _latest(table.c[name], stmt.excluded[name]) for name in latest}
+        )
+        db.session.execute(
+            stmt.on_conflict_do_update(index_elements=list(keys), set_=set_)
+        )
+        return
+
+    set_ = {name: table.c[name] + value for name, value in increments.items()}
+    set_.update({name: _latest(table.c[name], value) for name, value in latest.items()})
+    where = [table.c[name] == value for name, value in keys.items()]
+    updated = db.session.execute(update(table).where(*where).values(**set_))
+    if updated.rowcount == 0:
+        db.session.execute(insert(table).values(**values))
+
+
+def record_result_rollups(
+    result_id, quiz_id, user_id, marks_scored, total_marks, completed_at
+):
+    """Fold a newly written quiz result into the rollup tables"""
+    scored = 1 if total_marks else 0
+    score = (marks_scored or 0) * 100.0 / total_marks if total_marks else 0.0
+    completed_at = completed_at.replace(tzinfo=None)
+
+    subject_id = (
+        db.session.query(Chapter.subject_id)
+        .join(Quiz, Quiz.chapter_id == Chapter.id)
+        .filter(Quiz.id == quiz_id)
+        .scalar()
+    )
+    if subject_id is not None:
+        # A student counts towards a subject on their first result in it
+        seen_before = db.session.query(
+            QuizResult.query.join(Quiz, Quiz.id == QuizResult.quiz_id)
+            .join(Chapter, Chapter.id == Quiz.chapter_id)
+            .filter(
+                QuizResult.user_id == user_id,
+                Chapter.subject_id == subject_id,
+                QuizResult.id != result_id,
+            )
+            .exists()
+        ).scalar()
+        _upsert(
+            SubjectScoreRollup,
+            {"subject_id": subject_id},
+            {
+                "attempts": 1,
+                "scored_attempts": scored,
+                "score_sum": score,
+                "student_count": 0 if seen_before else 1,
+            },
+        )
+
+    _upsert(
+        UserScoreRollup,
+        {"user_id": user_id},
+        {
+            "attempts": 1,
+            "scored_attempts": scored,
+            "score_sum": score,
+            "marks_scored_sum": marks_scored or 0,
+            "total_marks_sum": total_marks or 0,
+        },
+        latest={"last_active": completed_at},
+    )
+    # Derived from the sums just updated, so it has to follow the upsert
+    db.session.execute(
+        update(UserScoreRollup)
+        .where(UserScoreRollup.user_id == user_id)
+        .values(
+            performance=case(
+                (
+                    UserScoreRollup.total_marks_sum > 0,
+                    UserScoreRollup.marks_scored_sum
+                    * 100.0
+                    / UserScoreRollup.total_marks_sum,
+                ),
+                else_=0.0,
+            )
+        )
+    )
+    _upsert(
+        DailyActivityRollup,
+        {"day": completed_at.date()},
+        {"attempts": 1, "scored_attempts": scored, "score_sum": score},
+    )
+
+
+def _result_score():
+    """Per-result score and scored flag, as in record_result_rollups"""
+    score = case(
+        (
+            QuizResult.total_marks > 0,
+            func.coalesce(QuizResult.marks_scored, 0) * 100.0 / QuizResult.total_marks,
+        ),
+        else_=0.0,
+    )
+    scored = case((QuizResult.total_marks > 0, 1), else_=0)
+    return score, scored
+
+
+def _result_day():
+    return func.date(QuizResult.completed_at)
+
+
+def _as_day(value):
+    # SQLite returns date() as a string
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return value
+
+
+def _rebuild_subject_rollups(subject_ids=None):
+    score, scored = _result_score()
+    stale = db.session.query(SubjectScoreRollup)
+    rows = (
+        db.session.query(
+            Chapter.subject_id,
+            func.count(QuizResult.id),
+            func.sum(scored),
+            func.sum(score),
+            func.count(func.distinct(QuizResult.user_id)),
+        )
+        .join(Quiz, Quiz.id == QuizResult.quiz_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .group_by(Chapter.subject_id)
+    )
+    if subject_ids is not None:
+        stale = stale.filter(SubjectScoreRollup.subject_id.in_(subject_ids))
+        rows = rows.filter(Chapter.subject_id.in_(subject_ids))
+
+    stale.delete(synchronize_session=False)
+    rows = rows.all()
+    if rows:
+        db.session.execute(
+            insert(SubjectScoreRollup),
+            [
+                {
+                    "subject_id": row[0],
+                    "attempts": row[1],
+                    "scored_attempts": row[2] or 0,
+                    "score_sum": row[3] or 0.0,
+                    "student_count": row[4],
+                }
+                for row in rows
+            ],
+        )
+
+
+def _rebuild_user_rollups(user_ids=None):
+    score, scored = _result_score()
+    stale = db.session.query(UserScoreRollup)
+    # Students without results get an empty row too (see create_score_rollup)
+    rows = (
+        db.session.query(
+            User.id,
+            func.count(QuizResult.id),
+            func.sum(scored),
+            func.sum(score),
+            func.sum(func.coalesce(QuizResult.marks_scored, 0)),
+            func.sum(func.coalesce(QuizResult.total_marks, 0)),
+            func.max(QuizResult.completed_at),
+        )
+        .outerjoin(QuizResult, QuizResult.user_id == User.id)
+        .filter(or_(User.role == "student", QuizResult.id.isnot(None)))
+        .group_by(User.id)
+    )
+    if user_ids is not None:
+        stale = stale.filter(UserScoreRollup.user_id.in_(user_ids))
+        rows = rows.filter(User.id.in_(user_ids))
+
+    stale.delete(synchronize_session=False)
+    rows = rows.all()
+    if rows:
+        db.session.execute(
+            insert(UserScoreRollup),
+            [
+                {
+                    "user_id": row[0],
+                    "attempts": row[1],
+                    "scored_attempts": row[2] or 0,
+                    "score_sum": row[3] or 0.0,
+                    "marks_scored_sum": row[4] or 0,
+                    "total_marks_sum": row[5] or 0,
+                    "performance": _percentage(row[4] or 0, row[5] or 0),
+                    "last_active": row[6],
+                }
+                for row in rows
+            ],
+        )
+
+
+def _rebuild_daily_rollups(days=None):
+    score, scored = _result_score()
+    day = _result_day()
+    stale = db.session.query(DailyActivityRollup)
+    rows = db.session.query(
+        day, func.count(QuizResult.id), func.sum(scored), func.sum(score)
+    ).group_by(day)
+    if days is not None:
+        stale = stale.filter(
+            DailyActivityRollup.day.in_([_as_day(value) for value in days])
+        )
+        rows = rows.filter(day.in_(days))
+
+    stale.delete(synchronize_session=False)
+    daily_rollups = [
+        {
+            "day": _as_day(row[0]),
+            "attempts": row[1],
+            "scored_attempts": row[2] or 0,
+            "score_sum": row[3] or 0.0,
+        }
+        for row in rows
+        if row[0] is not None
+    ]
+    if daily_rollups:
+        db.session.execute(insert(DailyActivityRollup), daily_rollups)
+
+
+def create_missing_rollups(users):
+    """
+    Create the rollup rows missing for any of `users` from their results, in
+    one grouped query, and commit. Rows are normally made with the user (see
+    create_score_rollup), so this only repairs gaps. Returns whether any
+    were created; loaded users are expired by the commit.
+    """
+    missing = [user.id for user in users if user.score_rollup is None]
+    if missing:
+        _rebuild_user_rollups(missing)
+        db.session.commit()
+    return bool(missing)
+
+
+def rebuild_rollups():
+    """
+    Recompute every rollup table from quiz_results, e.g. after quizzes move
+    between subjects, which the incremental path does not track. The caller
+    commits.
+    """
+    _rebuild_subject_rollups()
+    _rebuild_user_rollups()
+    _rebuild_daily_rollups()
+
+
+class ResultScope:
+    """Users, subjects and days that a set of quiz results counts towards"""
+
+    def __init__(self, user_ids, subject_ids, days):
+        self.user_ids = user_ids
+        self.subject_ids = subject_ids
+        self.days = days
+
+
+def result_scope(*criteria):
+    """
+    Scope of the quiz results matching `criteria` (filters on QuizResult,
+    Quiz or Chapter). Taken before the results are deleted, so their rollups
+    can be recomputed afterwards with refresh_rollups.
+    """
+    rows = (
+        db.session.query(QuizResult.user_id, Chapter.subject_id, _result_day())
+        .join(Quiz, Quiz.id == QuizResult.quiz_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .filter(*criteria)
+        .distinct()
+        .all()
+    )
+    return ResultScope(
+        sorted({row[0] for row in rows}),
+        sorted({row[1] for row in rows}),
+        sorted({row[2] for row in rows if row[2] is not None}),
+    )
+
+
+def refresh_subject_rollups(*subject_ids):
+    """
+    Recompute the rollups of these subjects, after quiz results moved
+    between them (a quiz or chapter was moved); the caller flushes first
+    """
+    if subject_ids:
+        _rebuild_subject_rollups(sorted(set(subject_ids)))
+
+
+def refresh_rollups(scope):
+    """
+    Recompute the rollups in `scope` from the remaining quiz results. Called
+    after deleting results (quiz, chapter and subject deletes cascade over
+    them); the caller flushes the delete first and commits afterwards.
+    """
+    if scope.subject_ids:
+        _rebuild_subject_rollups(scope.subject_ids)
+    if scope.user_ids:
+        _rebuild_user_rollups(scope.user_ids)
+    if scope.days:
+        _rebuild_daily_rollups(scope.days)
@@ -0,0 +1,315 @@
+"""
+Synthetic dataset generator for reproducing production-sized databases.
+
+Everything is derived from a seeded random.Random and ids are assigned up
+front, so rows are built in a single pass and written with bulk inserts
+without reading anything back. At scale=1 this produces 1,000 students,
+50 quizzes, 10,000 quiz results and 100,000 answers; every count grows
+linearly with the scale (scale=100 gives 100k students, 5k quizzes and 10M
+answers).
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import insert, text
+from werkzeug.security import generate_password_hash
+from . import db
+from .models import (
+    User,
+    Subject,
+    Chapter,
+    Quiz,
+    Question,
+    Option,
+    QuizResult,
+    UserAnswer,
+    PaymentHistory,
+)
+from .rollups import rebuild_rollups
+
+USERS_PER_SCALE = 1000
+SUBJECTS_PER_SCALE = 2
+CHAPTERS_PER_SUBJECT = 5
+QUIZZES_PER_CHAPTER = 5
+QUESTIONS_PER_QUIZ = 10
+OPTIONS_PER_QUESTION = 4
+ATTEMPTS_PER_USER = 10
+PAID_QUIZ_RATIO = 0.2
+HISTORY_DAYS = 180
+BATCH_SIZE = 10_000
+
+QUALIFICATIONS = ["High School", "Bachelors", "Masters", "PhD"]
+WORDS = [
+    "algebra", "biology", "circuits", "data", "energy", "fractions", "genetics",
+    "history", "inertia", "justice", "kinetics", "logic", "matrices", "nutrition",
+    "optics", "physics", "quantum", "reactions", "statistics", "thermodynamics",
+]
+
+
+class _BatchWriter:
+    """
+    Buffers rows per model and flushes them as executemany inserts. Buffers
+    are always flushed together in the order models were first added, so
+    parents reach the database before the rows referencing them.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.counts = {}
+
+    def add(self, model, row):
+        buffer = self.buffers.setdefault(model, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for model, rows in self.buffers.items():
+            if rows:
+                db.session.execute(insert(model), rows)
+                self.counts[model] = self.counts.get(model, 0) + len(rows)
+                self.buffers[model] = []
+        db.session.commit()
+
+
+def _sentence(rng, words=6):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def clear_database():
+    """Delete all rows the generator writes, children first"""
+    for model in (
+        UserAnswer,
+        QuizResult,
+        PaymentHistory,
+        Option,
+        Question,
+        Quiz,
+        Chapter,
+        Subject,
+        User,
+    ):
+        db.session.query(model).delete()
+    db.session.commit()
+
+
+def _reset_sequences(models):
+    """Explicit ids leave Postgres sequences behind; move them past max(id)"""
+    if db.engine.dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+            )
+        )
+    db.session.commit()
+
+
+def generate(scale=1, seed=42, anchor=None, password="password123", log=print):
+    """
+    Replace the database contents with a synthetic dataset.
+    anchor is the day results are spread back from (defaults to today), so
+    the same scale, seed and anchor always produce the same rows.
+    Returns a dict of row counts per table.
+    """
+    rng = random.Random(seed)
+    anchor = datetime.combine(anchor or date.today(), time())
+    writer = _BatchWriter()
+    # Hashing is deliberately slow, so every user shares one hash
+    password_hash = generate_password_hash(password)
+
+    clear_database()
+
+    num_users = USERS_PER_SCALE * scale
+    num_subjects = SUBJECTS_PER_SCALE * scale
+    num_chapters = num_subjects * CHAPTERS_PER_SUBJECT
+    num_quizzes = num_chapters * QUIZZES_PER_CHAPTER
+
+    # Users: id 1 is the admin, the rest are students
+    writer.add(
+        User,
+        {
+            "id": 1,
+            "name": "Admin",
+            "email": "admin@kwizzy.local",
+            "dob": date(1990, 1, 1),
+            "qualification": "Masters",
+            "role": "admin",
+            "password": password_hash,
+        },
+    )
+    for user_id in range(2, num_users + 2):
+        writer.add(
+            User,
+            {
+                "id": user_id,
+                "name": f"Student {user_id}",
+                "email": f"student{user_id}@kwizzy.local",
+                "dob": date(2000, 1, 1) + timedelta(days=rng.randrange(3650)),
+                "qualification": rng.choice(QUALIFICATIONS),
+                "role": "student",
+                "password": password_hash,
+            },
+        )
+    writer.flush()
+    log(f"Seeded {num_users + 1} users")
+
+    for subject_id in range(1, num_subjects + 1):
+        writer.add(
+            Subject,
+            {
+                "id": subject_id,
+                "name": f"Subject {subject_id}",
+                "description": _sentence(rng),
+            },
+        )
+    for chapter_id in range(1, num_chapters + 1):
+        writer.add(
+            Chapter,
+            {
+                "id": chapter_id,
+                "name": f"Chapter {chapter_id}",
+                "description": _sentence(rng),
+                "subject_id": (chapter_id - 1) // CHAPTERS_PER_SUBJECT + 1,
+            },
+        )
+
+    # Quiz q owns questions and options in contiguous id ranges, so answers
+    # can be generated arithmetically instead of by scanning lists
+    correct_index = []
+    paid_quizzes = []
+    for quiz_id in range(1, num_quizzes + 1):
+        price = rng.choice([100, 200, 500]) if rng.random() < PAID_QUIZ_RATIO else 0
+        if price:
+            paid_quizzes.append((quiz_id, price))
+        writer.add(
+            Quiz,
+            {
+                "id": quiz_id,
+                "name": f"Quiz {quiz_id}",
+                "description": _sentence(rng),
+                "price": price,
+                "chapter_id": (quiz_id - 1) // QUIZZES_PER_CHAPTER + 1,
+                "time_duration": rng.choice([600, 1200, 1800]),
+                "one_attempt_only": False,
+            },
+        )
+        for position in range(QUESTIONS_PER_QUIZ):
+            question_id = (quiz_id - 1) * QUESTIONS_PER_QUIZ + position + 1
+            writer.add(
+                Question,
+                {
+                    "id": question_id,
+                    "quiz_id": quiz_id,
+                    "title": f"Question {position + 1}",
+                    "text": _sentence(rng, 10) + "?",
+                },
+            )
+            correct = rng.randrange(OPTIONS_PER_QUESTION)
+            correct_index.append(correct)
+            for index in range(OPTIONS_PER_QUESTION):
+                writer.add(
+                    Option,
+                    {
+                        "id": (question_id - 1) * OPTIONS_PER_QUESTION + index + 1,
+                        "question_id": question_id,
+                        "text": _sentence(rng, 4),
+                        "is_correct": index == correct,
+                    },
+                )
+    writer.flush()
+    log(
+        f"Seeded {num_subjects} subjects, {num_chapters} chapters, "
+        f"{num_quizzes} quizzes, {len(correct_index)} questions"
+    )
+
+    # Quiz results with their answers; each student has a skill level so the
+    # score distribution is not uniform
+    result_id = 0
+    answer_id = 0
+    payment_id = 0
+    for user_id in range(2, num_users + 2):
+        skill = rng.betavariate(5, 2)
+        for _ in range(ATTEMPTS_PER_USER):
+            result_id += 1
+            quiz_id = rng.randint(1, num_quizzes)
+            completed_at = anchor - timedelta(
+                seconds=rng.randrange(HISTORY_DAYS * 24 * 3600)
+            )
+            answers = []
+            first_question = (quiz_id - 1) * QUESTIONS_PER_QUIZ + 1
+            for question_id in range(
+                first_question, first_question + QUESTIONS_PER_QUIZ
+            ):
+                answer_id += 1
+                correct = correct_index[question_id - 1]
+                if rng.random() < skill:
+                    chosen = correct
+                else:
+                    chosen = rng.randrange(OPTIONS_PER_QUESTION)
+                answers.append(
+                    {
+                        "id": answer_id,
+                        "result_id": result_id,
+                        "question_id": question_id,
+                        "selected_option": (question_id - 1) * OPTIONS_PER_QUESTION
+                        + chosen
+                        + 1,
+                        "is_correct": chosen == correct,
+                    }
+                )
+
+            writer.add(
+                QuizResult,
+                {
+                    "id": result_id,
+                    "quiz_id": quiz_id,
+                    "user_id": user_id,
+                    "marks_scored": sum(answer["is_correct"] for answer in answers),
+                    "total_marks": QUESTIONS_PER_QUIZ,
+                    "completed_at": completed_at,
+                },
+            )
+            for answer in answers:
+                writer.add(UserAnswer, answer)
+
+        if paid_quizzes:
+            quiz_id, price = rng.choice(paid_quizzes)
+            payment_id += 1
+            writer.add(
+                PaymentHistory,
+                {
+                    "id": payment_id,
+                    "user_id": user_id,
+                    "quiz_id": quiz_id,
+                    "transaction_id": f"TXN{seed}{payment_id:010d}",
+                    "amount": price,
+                    "status": "completed",
+                    "created_at": anchor
+                    - timedelta(seconds=rng.randrange(HISTORY_DAYS * 24 * 3600)),
+                },
+            )
+    writer.flush()
+    log(f"Seeded {result_id} quiz results and {answer_id} answers")
+
+    _reset_sequences(
+        [
+            User,
+            Subject,
+            Chapter,
+            Quiz,
+            Question,
+            Option,
+            QuizResult,
+            UserAnswer,
+            PaymentHistory,
+        ]
+    )
+    rebuild_rollups()
+    db.session.commit()
+    log("Rebuilt rollup tables")
+
+    return {model.__tablename__: count for model, count in writer.counts.items()}
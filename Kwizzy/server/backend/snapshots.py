@@ -0,0 +1,74 @@
+from sqlalchemy.orm import selectinload
+from . import cache
+from .models import Quiz, Question
+from .grading import get_quiz_version
+
+SNAPSHOT_TIMEOUT = 3600
+
+
+def format_duration(time_in_seconds):
+    hours = time_in_seconds // 3600
+    minutes = (time_in_seconds % 3600) // 60
+    return f"{hours:02d}:{minutes:02d}"
+
+
+def build_quiz_snapshot(quiz_id, include_answers):
+    """Serialize a quiz with its questions and options, None if it is missing"""
+    quiz = Quiz.query.options(
+        selectinload(Quiz.questions).selectinload(Question.options)
+    ).get(quiz_id)
+    if not quiz:
+        return None
+
+    return {
+        "id": quiz.id,
+        "name": quiz.name,
+        "description": quiz.description,
+        "price": quiz.price,
+        "chapter_id": quiz.chapter_id,
+        "time_duration": format_duration(quiz.time_duration),
+        "one_attempt_only": quiz.one_attempt_only,
+        "deadline": (
+            quiz.deadline.strftime("%d-%m-%Y %H:%M") if quiz.deadline else None
+        ),
+        "questions": [
+            {
+                "id": q.id,
+                "title": q.title,
+                "text": q.text,
+                "options": [
+                    {
+                        "id": opt.id,
+                        "text": opt.text,
+                        "is_correct": opt.is_correct if include_answers else None,
+                    }
+                    for opt in q.options
+                ],
+            }
+            for q in quiz.questions
+        ],
+    }
+
+
+def get_quiz_snapshot(quiz_id, include_answers=False):
+    """
+    Return (snapshot, version) for a quiz. Snapshots are immutable per content
+    version, so they are built once and shared by every request until a quiz,
+    question or option write bumps the version.
+    """
+    version = get_quiz_version(quiz_id)
+    variant = "answers" if include_answers else "questions"
+    cache_key = f"quiz_snapshot:{quiz_id}:{version}:{variant}"
+
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        snapshot = build_quiz_snapshot(quiz_id, include_answers)
+        if snapshot is None:
+            return None, version
+        cache.set(cache_key, snapshot, timeout=SNAPSHOT_TIMEOUT)
+    return snapshot, version
+
+
+def snapshot_etag(quiz_id, version, include_answers, has_attempted):
+    variant = "a" if include_answers else "q"
+    return f"quiz-{quiz_id}-{version}-{variant}-{int(bool(has_attempted))}"
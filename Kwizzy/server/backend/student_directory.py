@@ -0,0 +1,170 @@
+from datetime import date
+from sqlalchemy import and_, column, inspect, or_, text
+from sqlalchemy.orm import contains_eager, selectinload
+from . import db, cache
+from .models import User, UserScoreRollup
+from .cache_tags import tag_versions
+from .rollups import create_missing_rollups
+from .utils import encode_cursor, decode_cursor
+
+STUDENT_COUNT_TIMEOUT = 60
+# The trigram index can only answer terms of at least three characters
+MIN_INDEXED_TERM = 3
+
+# sort_by value -> (column, type of its cursor value)
+SORT_COLUMNS = {
+    "name": (User.name, str),
+    "email": (User.email, str),
+    "qualification": (User.qualification, str),
+    "dob": (User.dob, date),
+    # Kept per student in user_score_rollups (see rollups.py)
+    "performance": (UserScoreRollup.performance, float),
+    "attempts": (UserScoreRollup.attempts, int),
+}
+
+_search_table = {}
+
+
+def has_search_table():
+    """Whether the users_search FTS table exists (SQLite only)"""
+    url = str(db.engine.url)
+    if url not in _search_table:
+        _search_table[url] = inspect(db.engine).has_table("users_search")
+    return _search_table[url]
+
+
+def search_condition(search):
+    """
+    Substring match on name, email or qualification. On SQLite this goes
+    through the users_search trigram table, on Postgres the ILIKEs are
+    served by the pg_trgm indexes (see USER_SEARCH_DDL in models.py).
+    """
+    if (
+        db.engine.dialect.name == "sqlite"
+        and len(search) >= MIN_INDEXED_TERM
+        and has_search_table()
+    ):
+        phrase = '"%s"' % search.replace('"', '""')
+        matches = (
+            text("SELECT rowid FROM users_search WHERE users_search MATCH :phrase")
+            .bindparams(phrase=phrase)
+            .columns(column("rowid"))
+        )
+        return User.id.in_(matches)
+
+    return or_(
+        User.name.ilike(f"%{search}%"),
+        User.email.ilike(f"%{search}%"),
+        User.qualification.ilike(f"%{search}%"),
+    )
+
+
+def students_query(search="", min_performance=None, max_performance=None, rollup=False):
+    """
+    Students matching a search and performance range, with their rollup
+    rows loaded for serialization. The rollup is joined when a range is given
+    or `rollup` asks for it, on its raw columns so the rollup indexes serve
+    the order and range (every student has a row, from create_score_rollup,
+    rebuild_rollups or the migrations, so the inner join loses nobody);
+    otherwise it is fetched for the whole page in one extra query.
+    """
+    query = User.query.filter(User.role == "student")
+    if search:
+        query = query.filter(search_condition(search))
+    if rollup or min_performance is not None or max_performance is not None:
+        query = query.join(User.score_rollup).options(contains_eager(User.score_rollup))
+    else:
+        query = query.options(selectinload(User.score_rollup))
+    if min_performance is not None:
+        query = query.filter(UserScoreRollup.performance >= min_performance)
+    if max_performance is not None:
+        query = query.filter(UserScoreRollup.performance <= max_performance)
+    return query
+
+
+def count_students(search="", min_performance=None, max_performance=None):
+    """
+    Number of students matching the filters, cached for a short while so
+    page requests do not each run a full COUNT. Invalidated along with the
+    cached list responses ("students:list").
+    """
+    (version,) = tag_versions("students:list")
+    cache_key = (
+        f"student_count:{version}:{search.lower()}:{min_performance}:{max_performance}"
+    )
+    total = cache.get(cache_key)
+    if total is None:
+        total = (
+            students_query(search, min_performance, max_performance)
+            .order_by(None)
+            .count()
+        )
+        cache.set(cache_key, total, timeout=STUDENT_COUNT_TIMEOUT)
+    return total
+
+
+def page_students(
+    sort_by="name",
+    order="asc",
+    per_page=10,
+    cursor=None,
+    page=None,
+    search="",
+    min_performance=None,
+    max_performance=None,
+):
+    """
+    One page of students ordered by (sort column, id). With a cursor the
+    page starts right after the row it points to, which is an index range
+    scan however deep the page is; without one, `page` falls back to an
+    offset for clients that jump to numbered pages.
+    Returns (students, next_cursor). Raises ValueError on a bad sort key or
+    cursor.
+    """
+    if sort_by not in SORT_COLUMNS:
+        raise ValueError(f"Invalid sort_by: {sort_by}")
+    sort_column, value_type = SORT_COLUMNS[sort_by]
+    descending = order == "desc"
+    on_rollup = sort_column.class_ is UserScoreRollup
+    # Break ties on the id from the same table so one index covers the order
+    id_column = UserScoreRollup.user_id if on_rollup else User.id
+
+    query = students_query(search, min_performance, max_performance, on_rollup)
+    if cursor:
+        value, last_id = decode_cursor(cursor, value_type, int)
+        # The redundant bound on the sort column lets the index seek to the
+        # cursor instead of walking the rows before it
+        if descending:
+            query = query.filter(
+                sort_column <= value,
+                or_(
+                    sort_column < value,
+                    and_(sort_column == value, id_column < last_id),
+                ),
+            )
+        else:
+            query = query.filter(
+                sort_column >= value,
+                or_(
+                    sort_column > value,
+                    and_(sort_column == value, id_column > last_id),
+                ),
+            )
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column, id_column)
+    if page and not cursor:
+        query = query.offset((page - 1) * per_page)
+
+    students = query.limit(per_page + 1).all()
+    if create_missing_rollups(students):
+        students = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(students) > per_page:
+        students = students[:per_page]
+        last = students[-1]
+        row = last.score_rollup if on_rollup else last
+        next_cursor = encode_cursor(getattr(row, sort_column.key), last.id)
+    return students, next_cursor
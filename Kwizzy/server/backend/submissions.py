@@ -0,0 +1,51 @@
+from sqlalchemy import insert
+from . import db
+from .models import QuizResult, UserAnswer
+from .utils import IndianTimeZone
+from .rollups import record_result_rollups
+
+
+def record_submission(
+    quiz_id, user_id, marks_scored, total_marks, answers, completed_at=None
+):
+    """
+    Write a QuizResult and all of its UserAnswer rows with two bulk statements.
+    The result id comes back from the INSERT itself (RETURNING on backends that
+    support it) and the answers go out as one executemany batch, so no ORM
+    objects are built or flushed. Answers are dicts with question_id,
+    selected_option and is_correct. The dashboard rollups are updated in the
+    same transaction. The caller commits.
+    Returns (result_id, completed_at).
+    """
+    completed_at = completed_at or IndianTimeZone()
+
+    inserted = db.session.execute(
+        insert(QuizResult).values(
+            quiz_id=quiz_id,
+            user_id=user_id,
+            marks_scored=marks_scored,
+            total_marks=total_marks,
+            completed_at=completed_at,
+        )
+    )
+    result_id = inserted.inserted_primary_key[0]
+
+    if answers:
+        db.session.execute(
+            insert(UserAnswer),
+            [
+                {
+                    "result_id": result_id,
+                    "question_id": answer["question_id"],
+                    "selected_option": answer.get("selected_option"),
+                    "is_correct": bool(answer.get("is_correct")),
+                }
+                for answer in answers
+            ],
+        )
+
+    record_result_rollups(
+        result_id, quiz_id, user_id, marks_scored, total_marks, completed_at
+    )
+
+    return result_id, completed_at
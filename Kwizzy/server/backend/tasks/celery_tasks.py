@@ -1,76 +1,218 @@
 from __future__ import print_function
-from .. import celery
-from ..models import User, QuizResult, Quiz
+from .. import celery, db
+from ..models import User, QuizResult, Quiz, Chapter, Subject
 from datetime import datetime, timedelta
+from itertools import groupby
+from celery import chord
+from sqlalchemy import select
 from dotenv import load_dotenv
 import os
 import logging
-from jinja2 import Environment, FileSystemLoader
+import tempfile
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 from ..utils import IndianTimeZone, EmailRateLimiter
 
 
 template_dir = os.path.join(os.path.dirname(__file__), "templates")
-jinja_env = Environment(loader=FileSystemLoader(template_dir))
+# Compiled templates are kept on disk so worker restarts skip recompiling,
+# and templates are not re-checked for changes on every send
+template_cache_dir = os.getenv(
+    "JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "kwizzy-jinja")
+)
+os.makedirs(template_cache_dir, exist_ok=True)
+jinja_env = Environment(
+    loader=FileSystemLoader(template_dir),
+    bytecode_cache=FileSystemBytecodeCache(template_cache_dir),
+    auto_reload=os.getenv("JINJA_AUTO_RELOAD", "false").lower() == "true",
+)
+
+
+def render_shared(template_name, shared_data, recipient_fields, placeholder):
+    """
+    Render the part of a template shared by a whole batch once. Each
+    per-recipient field is rendered as `placeholder % field` for the
+    transport to fill in, so the expensive shared parts (lists, layout)
+    are never rendered per recipient. Contexts must be plain data, so
+    rendering never reaches the database.
+    """
+    placeholders = {field: placeholder % field for field in recipient_fields}
+    template = jinja_env.get_template(template_name)
+    return template.render(**shared_data, **placeholders)
+
 
 logger = logging.getLogger(__name__)
 
+# Students per monthly report subtask
+REPORT_CHUNK_SIZE = 200
+
 load_dotenv()
 import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
 
-configuration = sib_api_v3_sdk.Configuration()
-configuration.api_key["api-key"] = os.getenv("BREVO_API_KEY")
+# Brevo accepts at most this many message versions per request
+MAX_MESSAGE_VERSIONS = 1000
 
-api_instance = sib_api_v3_sdk.TransactionalEmailsApi(
-    sib_api_v3_sdk.ApiClient(configuration)
-)
 
+class BrevoTransport:
+    """Sends through the Brevo transactional email API"""
 
-class EmailService:
     def __init__(self):
-        self.rate_limiter = EmailRateLimiter()
+        configuration = sib_api_v3_sdk.Configuration()
+        configuration.api_key["api-key"] = os.getenv("BREVO_API_KEY")
+        self.api = sib_api_v3_sdk.TransactionalEmailsApi(
+            sib_api_v3_sdk.ApiClient(configuration)
+        )
 
-    @staticmethod
-    def send_email(to_email, to_name, subject, template_name, template_data):
-        try:
-            # Create rate limiter instance
-            rate_limiter = EmailRateLimiter()
+    def send(self, message):
+        return self.api.send_transac_email(message)
 
-            # Check if we can send more emails
-            if not rate_limiter.can_send_email():
-                logger.warning(
-                    f"Daily email limit reached. Cannot send email to {to_email}"
-                )
-                return False
 
+class StubTransport:
+    """Keeps messages in memory instead of sending them, for offline use"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+        recipients = sum(
+            len(version.to) for version in message.message_versions or []
+        ) or len(message.to or [])
+        logger.info(f"[stub] '{message.subject}' to {recipients} recipient(s)")
+
+
+def create_transport():
+    """Transport chosen by EMAIL_TRANSPORT: "brevo" (default) or "stub" """
+    if os.getenv("EMAIL_TRANSPORT", "brevo").lower() == "stub":
+        return StubTransport()
+    return BrevoTransport()
+
+
+class EmailService:
+    """
+    Renders templates and sends them through one shared transport and rate
+    limiter, so every send reuses the same API client and Redis connection
+    """
+
+    def __init__(self, transport=None, rate_limiter=None):
+        self.transport = transport or create_transport()
+        self.rate_limiter = rate_limiter or EmailRateLimiter()
+
+    @property
+    def sender(self):
+        return {"name": "Kwizzy", "email": os.getenv("MAIL_DEFAULT_SENDER")}
+
+    def send_email(self, to_email, to_name, subject, template_name, template_data):
+        # Reserve quota before sending, and hand it back if sending fails
+        if not self.rate_limiter.reserve(1):
+            logger.warning(
+                f"Daily email limit reached. Cannot send email to {to_email}"
+            )
+            return False
+
+        try:
             # Render HTML template
-            template = jinja_env.get_template(f"{template_name}")
+            template = jinja_env.get_template(template_name)
 
             # Render HTML content
             html_content = template.render(**template_data)
 
-            sender = {"name": "Kwizzy", "email": os.getenv("MAIL_DEFAULT_SENDER")}
-
             to = [{"email": to_email, "name": to_name}]
 
             send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-                to=to, html_content=html_content, sender=sender, subject=subject
+                to=to, html_content=html_content, sender=self.sender, subject=subject
             )
-            api_response = api_instance.send_transac_email(send_smtp_email)
-            rate_limiter.increment_count()
+            self.transport.send(send_smtp_email)
             logger.info(f"Email sent successfully to {to_email}")
             return True
 
         except ApiException as e:
+            self.rate_limiter.release(1)
             logger.error(f"Failed to send email: {e}")
             return False
+        except BaseException:
+            # Template, network or worker shutdown errors still return the quota
+            self.rate_limiter.release(1)
+            raise
+
+    def send_batch(self, subject, template_name, recipients, shared_data=None):
+        """
+        Send one template to many recipients as Brevo message versions.
+        recipients are dicts with email, name and params. The template is
+        rendered once with shared_data, and every key in params is rendered
+        as a {{ params.<key> }} placeholder that Brevo fills per recipient.
+        Quota for the whole batch is reserved up front; recipients beyond it
+        are skipped. Returns (sent, failed, skipped) counts.
+        """
+        if not recipients:
+            return 0, 0, 0
+
+        granted = self.rate_limiter.reserve(len(recipients))
+        skipped = len(recipients) - granted
+        if skipped:
+            logger.warning(
+                f"Daily email limit reached. Skipping {skipped} of {len(recipients)} recipients"
+            )
+        recipients = recipients[:granted]
+        if not recipients:
+            return 0, 0, skipped
+
+        sent = 0
+        failed = 0
+        try:
+            html_content = render_shared(
+                template_name,
+                shared_data or {},
+                {
+                    key
+                    for recipient in recipients
+                    for key in recipient.get("params", {})
+                },
+                "{{ params.%s }}",
+            )
+
+            for start in range(0, len(recipients), MAX_MESSAGE_VERSIONS):
+                batch = recipients[start : start + MAX_MESSAGE_VERSIONS]
+                message = sib_api_v3_sdk.SendSmtpEmail(
+                    sender=self.sender,
+                    subject=subject,
+                    html_content=html_content,
+                    message_versions=[
+                        sib_api_v3_sdk.SendSmtpEmailMessageVersions(
+                            to=[
+                                sib_api_v3_sdk.SendSmtpEmailTo1(
+                                    email=recipient["email"], name=recipient["name"]
+                                )
+                            ],
+                            params=recipient.get("params") or None,
+                        )
+                        for recipient in batch
+                    ],
+                )
+                try:
+                    self.transport.send(message)
+                    sent += len(batch)
+                except ApiException as e:
+                    failed += len(batch)
+                    self.rate_limiter.release(len(batch))
+                    logger.error(f"Failed to send batch of {len(batch)} emails: {e}")
+        except BaseException:
+            # Hand back the quota of every recipient not sent or failed yet
+            self.rate_limiter.release(len(recipients) - sent - failed)
+            raise
+
+        logger.info(f"Batch '{subject}': sent {sent}, failed {failed}")
+        return sent, failed, skipped
+
+
+email_service = EmailService()
 
 
 @celery.task
 def send_daily_reminders():
     """Send daily reminder to inactive user"""
     try:
-        rate_limiter = EmailRateLimiter()
+        rate_limiter = email_service.rate_limiter
         remaining_emails = rate_limiter.get_remaining_emails()
 
         if remaining_emails <= 0:
@@ -86,45 +228,29 @@ def send_daily_reminders():
             logger.info("No students found in the database")
             return {"status": "success", "message": "No students to send reminders to"}
         # Get new quizzes
-        new_quizzes = Quiz.query.order_by(Quiz.id.desc()).limit(3).all()
-
-        successful_sends = 0
-        failed_sends = 0
-        skipped_sends = 0
-
-        for student in students:
-            if not rate_limiter.can_send_email():
-                skipped_sends += len(students) - (successful_sends + failed_sends)
-                logger.warning(
-                    f"Daily limit reached. Skipping remaining {skipped_sends} students"
-                )
-                break
-            try:
-                template_data = {
-                    "student_name": student.name,
-                    "new_quizzes": new_quizzes,
-                    "dashboard_url": f"{os.getenv('FRONTEND_URL')}/login",
+        new_quizzes = [
+            {"name": name, "description": description}
+            for name, description in db.session.query(Quiz.name, Quiz.description)
+            .order_by(Quiz.id.desc())
+            .limit(3)
+        ]
+
+        successful_sends, failed_sends, skipped_sends = email_service.send_batch(
+            subject="Your Daily Quiz Practice Reminder",
+            template_name="daily_reminder.html",
+            recipients=[
+                {
+                    "email": student.email,
+                    "name": student.name,
+                    "params": {"student_name": student.name},
                 }
-
-                result = EmailService.send_email(
-                    to_email=student.email,
-                    to_name=student.name,
-                    subject="Your Daily Quiz Practice Reminder",
-                    template_name="daily_reminder.html",
-                    template_data=template_data,
-                )
-
-                if result:
-                    successful_sends += 1
-                    logger.info(f"Reminder sent successfully to {student.email}")
-                else:
-                    failed_sends += 1
-                    logger.error(f"Failed to send reminder to {student.email}")
-
-            except ApiException as e:
-                failed_sends += 1
-                logger.error(f"Failed to send reminder to {student.email}: {str(e)}")
-                continue
+                for student in students
+            ],
+            shared_data={
+                "new_quizzes": new_quizzes,
+                "dashboard_url": f"{os.getenv('FRONTEND_URL')}/login",
+            },
+        )
 
         return {
             "status": "success",
@@ -150,14 +276,98 @@ def send_daily_reminders():
         return {"status": "error", "message": str(e)}
 
 
+def _percentage(marks_scored, total_marks):
+    return (marks_scored / total_marks) * 100 if total_marks else 0
+
+
+def build_monthly_report(student_id, student_name, rows, report_period):
+    """
+    Template data for one student's report from their (quiz_name,
+    subject_name, marks_scored, total_marks, completed_at) rows
+    """
+    scores = [_percentage(row[2], row[3]) for row in rows]
+    best_index = max(range(len(rows)), key=lambda i: scores[i])
+
+    subject_performance = {}
+    for row, score in zip(rows, scores):
+        subject = subject_performance.setdefault(
+            row[1], {"total_quizzes": 0, "total_score": 0}
+        )
+        subject["total_quizzes"] += 1
+        subject["total_score"] += score
+    for subject in subject_performance.values():
+        subject["average_score"] = round(
+            subject["total_score"] / subject["total_quizzes"], 2
+        )
+
+    return {
+        "student_name": student_name,
+        "report_period": report_period,
+        "total_quizzes": len(rows),
+        "average_score": round(sum(scores) / len(rows), 2),
+        "best_score": round(scores[best_index], 2),
+        "best_quiz_name": rows[best_index][0],
+        "subject_performance": subject_performance,
+        "quiz_history": [
+            {
+                "date": row[4].strftime("%Y-%m-%d"),
+                "quiz_name": row[0],
+                "score": round(score, 2),
+            }
+            for row, score in zip(rows, scores)
+        ],
+        "dashboard_url": f"{os.getenv('FRONTEND_URL')}/student/{student_id}",
+    }
+
+
+def monthly_reports(period_start, period_end, report_period):
+    """
+    Yield (email, name, template_data) for every student with activity in
+    the period, from a single query streamed in user order
+    """
+    query = (
+        select(
+            QuizResult.user_id,
+            User.name,
+            User.email,
+            Quiz.name,
+            Subject.name,
+            QuizResult.marks_scored,
+            QuizResult.total_marks,
+            QuizResult.completed_at,
+        )
+        .join(User, User.id == QuizResult.user_id)
+        .join(Quiz, Quiz.id == QuizResult.quiz_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .join(Subject, Subject.id == Chapter.subject_id)
+        .where(
+            User.role == "student",
+            QuizResult.completed_at >= period_start,
+            QuizResult.completed_at < period_end,
+        )
+        .order_by(QuizResult.user_id, QuizResult.completed_at)
+        .execution_options(yield_per=1000)
+    )
+    rows = db.session.execute(query)
+    for student_id, student_rows in groupby(rows, key=lambda row: row[0]):
+        student_rows = list(student_rows)
+        _, name, email = student_rows[0][:3]
+        yield email, name, build_monthly_report(
+            student_id, name, [row[3:] for row in student_rows], report_period
+        )
+
+
 @celery.task
 def generate_monthly_activity_report():
     """
     Generate and send monthly activity reports for all students
-    Scheduled to run on the first day of each month
+    Scheduled to run on the first day of each month. Stats for every
+    student are computed here in one pass, then rendering and sending is
+    fanned out as a chord of REPORT_CHUNK_SIZE-student subtasks, so several
+    workers share the load and a failing chunk is retried on its own.
     """
     try:
-        rate_limiter = EmailRateLimiter()
+        rate_limiter = email_service.rate_limiter
         remaining_emails = rate_limiter.get_remaining_emails()
 
         if remaining_emails <= 0:
@@ -171,133 +381,45 @@ def generate_monthly_activity_report():
             }
 
         # Get previous month's date range
-        today = datetime.now()
-        first_day_current = today.replace(day=1)
-        last_day_previous = first_day_current - timedelta(days=1)
-        first_day_previous = last_day_previous.replace(day=1)
-
-        logger.info(
-            f"Generating monthly reports for period: {first_day_previous.strftime('%B %Y')}"
+        first_day_current = datetime.now().replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
         )
+        first_day_previous = (first_day_current - timedelta(days=1)).replace(day=1)
+        report_period = first_day_previous.strftime("%B %Y")
+
+        logger.info(f"Generating monthly reports for period: {report_period}")
+
+        chunks = []
+        chunk = []
+        for report in monthly_reports(
+            first_day_previous, first_day_current, report_period
+        ):
+            chunk.append(report)
+            if len(chunk) == REPORT_CHUNK_SIZE:
+                chunks.append(chunk)
+                chunk = []
+        if chunk:
+            chunks.append(chunk)
+
+        if not chunks:
+            return {
+                "status": "success",
+                "message": "No student activity to report",
+                "details": {"period": report_period, "total_students": 0},
+            }
 
-        # Get all students
-        students = User.query.filter_by(role="student").all()
-
-        successful_sends = 0
-        failed_sends = 0
-        skipped_sends = 0
-
-        for student in students:
-            try:
-                if not rate_limiter.can_send_email():
-                    skipped_sends += len(students) - (successful_sends + failed_sends)
-                    logger.warning(
-                        f"Daily limit reached. Skipping remaining {skipped_sends} students"
-                    )
-                    break
-                # Get student's quiz activity for previous month
-                monthly_quiz_results = (
-                    QuizResult.query.join(Quiz)
-                    .filter(
-                        QuizResult.user_id == student.id,
-                        QuizResult.completed_at >= first_day_previous,
-                        QuizResult.completed_at <= last_day_previous,
-                    )
-                    .all()
-                )
-
-                # Calculate statistics
-                total_quizzes = len(monthly_quiz_results)
-                if total_quizzes == 0:
-                    continue  # Skip if no activity
-
-                total_score = sum(
-                    (result.marks_scored / result.total_marks) * 100
-                    for result in monthly_quiz_results
-                )
-                average_score = round(total_score / total_quizzes, 2)
-
-                # Get performance by subject
-                subject_performance = {}
-                for result in monthly_quiz_results:
-                    subject_name = result.quiz.chapter.subject.name
-                    if subject_name not in subject_performance:
-                        subject_performance[subject_name] = {
-                            "total_quizzes": 0,
-                            "total_score": 0,
-                        }
-                    subject_performance[subject_name]["total_quizzes"] += 1
-                    subject_performance[subject_name]["total_score"] += (
-                        result.marks_scored / result.total_marks
-                    ) * 100
-
-                # Calculate average score per subject
-                for subject in subject_performance.values():
-                    subject["average_score"] = round(
-                        subject["total_score"] / subject["total_quizzes"], 2
-                    )
-
-                # Get best performance
-                best_quiz = max(
-                    monthly_quiz_results, key=lambda x: (x.marks_scored / x.total_marks)
-                )
-                best_score = round(
-                    (best_quiz.marks_scored / best_quiz.total_marks) * 100, 2
-                )
-
-                # Prepare template data
-                template_data = {
-                    "student_name": student.name,
-                    "report_period": first_day_previous.strftime("%B %Y"),
-                    "total_quizzes": total_quizzes,
-                    "average_score": average_score,
-                    "best_score": best_score,
-                    "best_quiz_name": best_quiz.quiz.name,
-                    "subject_performance": subject_performance,
-                    "quiz_history": [
-                        {
-                            "date": result.completed_at.strftime("%Y-%m-%d"),
-                            "quiz_name": result.quiz.name,
-                            "score": round(
-                                (result.marks_scored / result.total_marks) * 100, 2
-                            ),
-                        }
-                        for result in monthly_quiz_results
-                    ],
-                    "dashboard_url": f"{os.getenv('FRONTEND_URL')}/student/{student.id}",
-                }
-
-                # Send email
-                result = EmailService.send_email(
-                    to_email=student.email,
-                    to_name=student.name,
-                    subject=f"Your Monthly Activity Report - {first_day_previous.strftime('%B %Y')}",
-                    template_name="monthly_report.html",
-                    template_data=template_data,
-                )
-
-                if result:
-                    successful_sends += 1
-                    logger.info(f"Monthly report sent successfully to {student.email}")
-                else:
-                    failed_sends += 1
-                    logger.error(f"Failed to send monthly report to {student.email}")
-
-            except Exception as e:
-                failed_sends += 1
-                logger.error(f"Error processing report for {student.email}: {str(e)}")
-                continue
+        chord(
+            send_monthly_report_chunk.s(chunk, report_period) for chunk in chunks
+        )(summarize_monthly_reports.s(report_period))
 
+        total_students = sum(len(chunk) for chunk in chunks)
         return {
             "status": "success",
-            "message": f"Monthly reports processed. Success: {successful_sends}, Failed: {failed_sends}",
+            "message": f"Monthly reports queued for {total_students} students",
             "details": {
-                "successful_sends": successful_sends,
-                "failed_sends": failed_sends,
-                "total_students": len(students),
-                "period": first_day_previous.strftime("%B %Y"),
-                "remaining_quota": rate_limiter.get_remaining_emails(),
-                "skipped_sends": skipped_sends,
+                "total_students": total_students,
+                "chunks": len(chunks),
+                "period": report_period,
             },
         }
 
@@ -309,11 +431,85 @@ def generate_monthly_activity_report():
         }
 
 
+@celery.task(bind=True, max_retries=3, default_retry_delay=60)
+def send_monthly_report_chunk(self, reports, report_period, successful_sends=0):
+    """
+    Send one chunk of monthly reports. Failed sends are retried as a
+    smaller chunk, carrying over the count of reports already sent.
+    """
+    rate_limiter = email_service.rate_limiter
+    failed = []
+    skipped_sends = 0
+
+    for index, (email, name, template_data) in enumerate(reports):
+        if not rate_limiter.can_send_email():
+            skipped_sends = len(reports) - index
+            logger.warning(
+                f"Daily limit reached. Skipping remaining {skipped_sends} students"
+            )
+            break
+        try:
+            sent = email_service.send_email(
+                to_email=email,
+                to_name=name,
+                subject=f"Your Monthly Activity Report - {report_period}",
+                template_name="monthly_report.html",
+                template_data=template_data,
+            )
+        except Exception as e:
+            logger.error(f"Error processing report for {email}: {str(e)}")
+            sent = False
+
+        if sent:
+            successful_sends += 1
+            logger.info(f"Monthly report sent successfully to {email}")
+        else:
+            failed.append((email, name, template_data))
+            logger.error(f"Failed to send monthly report to {email}")
+
+    if failed and self.request.retries < self.max_retries:
+        raise self.retry(
+            args=(failed, report_period),
+            kwargs={"successful_sends": successful_sends},
+        )
+
+    return {
+        "successful_sends": successful_sends,
+        "failed_sends": len(failed),
+        "skipped_sends": skipped_sends,
+    }
+
+
+@celery.task
+def summarize_monthly_reports(chunk_results, report_period):
+    """Chord callback adding up the per-chunk send counts"""
+    successful_sends = sum(r["successful_sends"] for r in chunk_results)
+    failed_sends = sum(r["failed_sends"] for r in chunk_results)
+    skipped_sends = sum(r["skipped_sends"] for r in chunk_results)
+
+    logger.info(
+        f"Monthly reports for {report_period} processed. "
+        f"Success: {successful_sends}, Failed: {failed_sends}, Skipped: {skipped_sends}"
+    )
+    return {
+        "status": "success",
+        "message": f"Monthly reports processed. Success: {successful_sends}, Failed: {failed_sends}",
+        "details": {
+            "successful_sends": successful_sends,
+            "failed_sends": failed_sends,
+            "total_students": successful_sends + failed_sends + skipped_sends,
+            "period": report_period,
+            "remaining_quota": email_service.rate_limiter.get_remaining_emails(),
+            "skipped_sends": skipped_sends,
+        },
+    }
+
+
 @celery.task
 def send_export_notification(to_email, to_name, subject, download_url):
     """Send notification when export is ready"""
     try:
-        rate_limiter = EmailRateLimiter()
+        rate_limiter = email_service.rate_limiter
 
         if not rate_limiter.can_send_email():
             logger.warning(
@@ -328,7 +524,7 @@ def send_export_notification(to_email, to_name, subject, download_url):
             "expiry_note": "This download link will expire in 7 days.",
         }
 
-        result = EmailService.send_email(
+        result = email_service.send_email(
             to_email=to_email,
             to_name=to_name,
             subject=f"Your {subject} is Ready",
@@ -361,7 +557,7 @@ def test_email_template(to_email, to_name):
             "dashboard_url": "http://localhost:5173/login",
         }
 
-        EmailService.send_email(
+        email_service.send_email(
             to_email=to_email,
             to_name=to_name,
             subject="Test Email Template",
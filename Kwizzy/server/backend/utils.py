@@ -2,9 +2,11 @@ from functools import wraps
 from flask_jwt_extended import get_jwt
 from flask import current_app as app
 import pytz
-from datetime import datetime
+from datetime import date, datetime
 import redis
 import os
+import json
+import base64
 import logging
 
 logger = logging.getLogger(__name__)
@@ -65,55 +67,191 @@ def format_ist_datetime(dt):
     )  # Example: "07-01-2025 10:07:18 PM IST"
 
 
-class EmailRateLimiter:
-    def __init__(self):
-        self.redis_client = redis.Redis(
+def encode_cursor(*values):
+    """Encode keyset pagination values into an opaque URL-safe cursor"""
+    payload = [
+        value.isoformat() if isinstance(value, date) else value for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor, *types):
+    """
+    Decode a cursor made by encode_cursor, converting each value with the
+    matching type (date and datetime values are parsed from ISO format).
+    Raises ValueError on a malformed cursor.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("Invalid cursor")
+        return [
+            type_.fromisoformat(value) if type_ in (date, datetime) else type_(value)
+            for value, type_ in zip(values, types)
+        ]
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+_redis_pool = None
+
+
+def get_redis():
+    """Redis client on a connection pool shared by the whole process"""
+    global _redis_pool
+    if _redis_pool is None:
+        _redis_pool = redis.ConnectionPool(
             host=os.getenv("REDIS_HOST", "localhost"),
             port=int(os.getenv("REDIS_PORT", 6379)),
             db=int(os.getenv("REDIS_DB", 0)),
         )
-        self.daily_limit = 300  # Brevo free tier limit
+    return redis.Redis(connection_pool=_redis_pool)
 
-    def can_send_email(self):
-        """Check if we can send more emails today"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        key = f"email_count:{today}"
 
-        # Get current count
-        count = int(self.redis_client.get(key) or 0)
+# KEYS: current and previous window counters, two per quota
+# ARGV: requested, allow partial (1/0), then limit, previous window weight
+# and ttl for each quota
+RESERVE_SCRIPT = """
+local requested = tonumber(ARGV[1])
+local granted = requested
+for i = 1, #KEYS / 2 do
+    local limit = tonumber(ARGV[i * 3])
+    local weight = tonumber(ARGV[i * 3 + 1])
+    local current = tonumber(redis.call('GET', KEYS[i * 2 - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[i * 2]) or '0')
+    local available = math.floor(limit - current - previous * weight)
+    if available < granted then
+        granted = math.max(available, 0)
+    end
+end
+if granted < requested and ARGV[2] == '0' then
+    granted = 0
+end
+if granted > 0 then
+    for i = 1, #KEYS / 2 do
+        redis.call('INCRBY', KEYS[i * 2 - 1], granted)
+        redis.call('EXPIRE', KEYS[i * 2 - 1], tonumber(ARGV[i * 3 + 2]))
+    end
+end
+return granted
+"""
 
-        if count >= self.daily_limit:
-            logger.warning(f"Daily email limit reached: {count}/{self.daily_limit}")
-            return False
+# KEYS: current window counter per quota; ARGV: units to give back
+RELEASE_SCRIPT = """
+local count = tonumber(ARGV[1])
+for _, key in ipairs(KEYS) do
+    local current = tonumber(redis.call('GET', key) or '0')
+    local give_back = math.min(count, current)
+    if give_back > 0 then
+        redis.call('DECRBY', key, give_back)
+    end
+end
+return 0
+"""
 
-        return True
 
-    def increment_count(self):
-        """Increment the email count for today"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        key = f"email_count:{today}"
+def local_time():
+    """Epoch seconds shifted to local time, so day windows end at midnight"""
+    now = datetime.now().astimezone()
+    return now.timestamp() + now.utcoffset().total_seconds()
 
-        # Increment counter
-        new_count = self.redis_client.incr(key)
 
-        # Set expiry if not already set
-        if new_count == 1:
-            # Set to expire at midnight
-            seconds_until_midnight = (
-                (24 - datetime.now().hour) * 3600
-                - datetime.now().minute * 60
-                - datetime.now().second
-            )
-            self.redis_client.expire(key, seconds_until_midnight)
+class Quota:
+    """
+    At most `limit` units per `window` seconds. Sliding quotas weight the
+    previous window's count by how much of it still overlaps the last
+    `window` seconds; fixed quotas reset at each window boundary.
+    """
 
-        return new_count
+    def __init__(self, name, limit, window, sliding=True):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.sliding = sliding
 
-    def get_remaining_emails(self):
-        """Get remaining email quota for today"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        key = f"email_count:{today}"
+    def keys(self, now):
+        index = int(now // self.window)
+        return (
+            f"ratelimit:{self.name}:{index}",
+            f"ratelimit:{self.name}:{index - 1}",
+        )
+
+    def previous_weight(self, now):
+        if not self.sliding:
+            return 0
+        return 1 - (now % self.window) / self.window
+
+
+class RateLimiter:
+    """
+    Reserves units against one or more named quotas in a single Lua call,
+    so concurrent workers can never push a quota past its limit
+    """
+
+    def __init__(self, *quotas, client=None, clock=local_time):
+        self.quotas = quotas
+        self.redis_client = client or get_redis()
+        self.clock = clock
+        self._reserve = self.redis_client.register_script(RESERVE_SCRIPT)
+        self._release = self.redis_client.register_script(RELEASE_SCRIPT)
 
-        count = int(self.redis_client.get(key) or 0)
-        remaining = self.daily_limit - count
+    def reserve(self, count=1, partial=True):
+        """
+        Take count units from every quota. With partial, grant as many as
+        all quotas allow, otherwise all or nothing. Returns units granted.
+        """
+        now = self.clock()
+        keys = []
+        args = [count, 1 if partial else 0]
+        for quota in self.quotas:
+            keys.extend(quota.keys(now))
+            args.extend([quota.limit, quota.previous_weight(now), quota.window * 2])
+        return int(self._reserve(keys=keys, args=args))
 
-        return max(0, remaining)
+    def release(self, count=1):
+        """Give back units reserved for work that did not happen"""
+        now = self.clock()
+        keys = [quota.keys(now)[0] for quota in self.quotas]
+        self._release(keys=keys, args=[count])
+
+    def remaining(self):
+        """Units that could be reserved right now"""
+        now = self.clock()
+        pipe = self.redis_client.pipeline(transaction=False)
+        for quota in self.quotas:
+            pipe.mget(quota.keys(now))
+        counts = pipe.execute()
+
+        remaining = []
+        for quota, (current, previous) in zip(self.quotas, counts):
+            used = int(current or 0) + int(previous or 0) * quota.previous_weight(now)
+            remaining.append(int(quota.limit - used))
+        return max(0, min(remaining))
+
+
+class EmailRateLimiter(RateLimiter):
+    daily_limit = 300  # Brevo free tier limit
+
+    def __init__(self, client=None, clock=local_time):
+        super().__init__(
+            Quota("email_daily", self.daily_limit, 24 * 3600, sliding=False),
+            client=client,
+            clock=clock,
+        )
+
+    def can_send_email(self):
+        """Check if we can send more emails today"""
+        if self.remaining() <= 0:
+            logger.warning(f"Daily email limit reached: {self.daily_limit}")
+            return False
+
+        return True
+
+    def increment_count(self):
+        """Count one email sent today, returning today's total"""
+        self.reserve(1)
+        return self.daily_limit - self.remaining()
+
+    def get_remaining_emails(self):
+        """Get remaining email quota for today"""
+        return self.remaining()
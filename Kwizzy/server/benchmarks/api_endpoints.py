@@ -0,0 +1,360 @@
+"""
+End-to-end benchmark of the API resources through the Flask test client.
+
+Seeds a synthetic dataset (see backend/seed.py), then drives the key
+endpoints either one scenario at a time or as a concurrent mixed load, and
+reports p50/p95/p99 latency, throughput and SQL queries per request.
+
+    python -m benchmarks.api_endpoints                       # sequential run
+    python -m benchmarks.api_endpoints --concurrency 8       # mixed load
+    python -m benchmarks.api_endpoints --save-baseline       # record baseline
+    python -m benchmarks.api_endpoints --compare             # fail on regressions
+
+A compare needs the --iterations, --concurrency, --scale and --seed the
+baseline was recorded with, as queries per request are averaged over a run
+that starts with cold caches.
+
+Point --database-uri at an already seeded database (SQLite or Postgres) and
+pass --no-seed to benchmark existing data.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter_ns
+
+from .common import bootstrap, summarize
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Queries per request are averages over a run that starts with cold caches,
+# so they only compare between runs with the same settings
+RUN_SETTINGS = ["iterations", "concurrency", "scale", "seed"]
+PASSWORD = "password123"
+
+
+class QueryCounter:
+    """Counts SQL statements per thread through an engine event"""
+
+    def __init__(self, engine):
+        self.local = threading.local()
+        from sqlalchemy import event
+
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.local.count = getattr(self.local, "count", 0) + 1
+
+    def reset(self):
+        self.local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self.local, "count", 0)
+
+
+class Scenarios:
+    """Request builders for each benchmarked endpoint"""
+
+    def __init__(self, app, rng):
+        from backend import db
+        from backend.models import User, Quiz, Question, Option
+
+        self.rng = rng
+        with app.app_context():
+            self.quiz_ids = [row[0] for row in db.session.query(Quiz.id).all()]
+            self.student_ids = [
+                row[0]
+                for row in db.session.query(User.id).filter(User.role == "student")
+            ]
+            admin_email = (
+                db.session.query(User.email).filter(User.role == "admin").scalar()
+            )
+            student_email = (
+                db.session.query(User.email)
+                .filter(User.id == self.student_ids[0])
+                .scalar()
+            )
+            self.options = {}
+            for question_id, quiz_id, option_id in (
+                db.session.query(Question.id, Question.quiz_id, Option.id)
+                .join(Option, Option.question_id == Question.id)
+                .all()
+            ):
+                self.options.setdefault(quiz_id, {}).setdefault(question_id, []).append(
+                    option_id
+                )
+
+        client = app.test_client()
+        self.credentials = {"email": student_email, "password": PASSWORD}
+        self.admin_token = self._login(client, admin_email)
+        self.student_token = self._login(client, student_email)
+        self.num_pages = max(1, len(self.student_ids) // 10)
+
+    @staticmethod
+    def _login(client, email):
+        response = client.post(
+            "/api/login", json={"email": email, "password": PASSWORD}
+        )
+        if response.status_code != 200:
+            sys.exit(f"Could not log in as {email}: {response.get_json()}")
+        return response.get_json()["access_token"]
+
+    def _auth(self, token):
+        return {"Authorization": f"Bearer {token}"}
+
+    def login(self):
+        return "post", "/api/login", {"json": self.credentials}
+
+    def subjects(self):
+        return "get", "/api/subject", {"headers": self._auth(self.student_token)}
+
+    def quiz_fetch(self):
+        quiz_id = self.rng.choice(self.quiz_ids)
+        return (
+            "get",
+            f"/api/quizzes/{quiz_id}",
+            {"headers": self._auth(self.student_token)},
+        )
+
+    def quiz_submit(self):
+        quiz_id = self.rng.choice(list(self.options))
+        answers = [
+            {"question_id": question_id, "selected_option_id": self.rng.choice(opts)}
+            for question_id, opts in self.options[quiz_id].items()
+        ]
+        return (
+            "post",
+            "/api/user-answers",
+            {
+                "headers": self._auth(self.student_token),
+                "json": {"quiz_id": quiz_id, "answers": answers},
+            },
+        )
+
+    def quiz_results(self):
+        return "get", "/api/quiz-results", {"headers": self._auth(self.student_token)}
+
+    def student_list(self):
+        page = self.rng.randint(1, self.num_pages)
+        return (
+            "get",
+            f"/api/students?page={page}",
+            {"headers": self._auth(self.admin_token)},
+        )
+
+    def student_detail(self):
+        student_id = self.rng.choice(self.student_ids)
+        return (
+            "get",
+            f"/api/student/{student_id}",
+            {"headers": self._auth(self.admin_token)},
+        )
+
+    def admin_charts(self):
+        return "get", "/api/admin/charts", {"headers": self._auth(self.admin_token)}
+
+    def transaction_export(self):
+        student_id = self.rng.choice(self.student_ids)
+        return (
+            "get",
+            f"/api/export/transactions/{student_id}",
+            {"headers": self._auth(self.admin_token)},
+        )
+
+    NAMES = [
+        "login",
+        "subjects",
+        "quiz_fetch",
+        "quiz_submit",
+        "quiz_results",
+        "student_list",
+        "student_detail",
+        "admin_charts",
+        "transaction_export",
+    ]
+
+
+def run_request(client, counter, scenarios, name):
+    method, url, kwargs = getattr(scenarios, name)()
+    counter.reset()
+    start = perf_counter_ns()
+    response = getattr(client, method)(url, **kwargs)
+    response.get_data()
+    elapsed = (perf_counter_ns() - start) / 1_000_000
+    return name, elapsed, counter.count, response.status_code
+
+
+def report(samples, wall_ms):
+    """samples: {scenario: [(elapsed_ms, queries, status), ...]}"""
+    results = {}
+    for name, rows in samples.items():
+        stats = summarize([row[0] for row in rows])
+        stats["queries_per_request"] = round(
+            sum(row[1] for row in rows) / len(rows), 1
+        )
+        stats["errors"] = sum(1 for row in rows if row[2] >= 400)
+        stats["throughput_rps"] = round(len(rows) / (wall_ms[name] / 1000), 1)
+        results[name] = stats
+
+    print(
+        f"{'scenario':<20}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'req/s':>10}{'queries':>9}{'errors':>8}"
+    )
+    for name, stats in results.items():
+        print(
+            f"{name:<20}{stats['count']:>6}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+            f"{stats['p99_ms']:>10}{stats['throughput_rps']:>10}"
+            f"{stats['queries_per_request']:>9}{stats['errors']:>8}"
+        )
+    return results
+
+
+def run_sequential(app, counter, scenarios, names, iterations):
+    client = app.test_client()
+    samples = {}
+    wall_ms = {}
+    for name in names:
+        start = perf_counter_ns()
+        for _ in range(iterations):
+            _, elapsed, queries, status = run_request(client, counter, scenarios, name)
+            samples.setdefault(name, []).append((elapsed, queries, status))
+        wall_ms[name] = (perf_counter_ns() - start) / 1_000_000
+    return samples, wall_ms
+
+
+def run_load(app, counter, scenarios, names, iterations, concurrency, seed):
+    """Mixed workload: every worker issues `iterations` random requests"""
+
+    def worker(worker_id):
+        client = app.test_client()
+        rng = random.Random(seed + worker_id)
+        return [
+            run_request(client, counter, scenarios, rng.choice(names))
+            for _ in range(iterations)
+        ]
+
+    start = perf_counter_ns()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        batches = list(pool.map(worker, range(concurrency)))
+    wall = (perf_counter_ns() - start) / 1_000_000
+
+    samples = {}
+    for batch in batches:
+        for name, elapsed, queries, status in batch:
+            samples.setdefault(name, []).append((elapsed, queries, status))
+    # Scenarios share the wall clock, so throughput is each one's share of it
+    return samples, {name: wall for name in samples}
+
+
+def compare(results, baseline, latency_tolerance, query_tolerance):
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        # Averages move a little with the sampled ids and cache state
+        queries = base["queries_per_request"] * (1 + query_tolerance)
+        if stats["queries_per_request"] > queries:
+            regressions.append(
+                f"{name}: {stats['queries_per_request']} queries/request "
+                f"(baseline {base['queries_per_request']})"
+            )
+        limit = base["p95_ms"] * (1 + latency_tolerance)
+        if stats["p95_ms"] > limit:
+            regressions.append(
+                f"{name}: p95 {stats['p95_ms']} ms (baseline {base['p95_ms']} ms)"
+            )
+        if stats["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: {stats['errors']} failed requests")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--database-uri")
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="+", choices=Scenarios.NAMES)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument(
+        "--latency-tolerance",
+        type=float,
+        default=0.5,
+        help="allowed p95 growth over the baseline, as a fraction",
+    )
+    parser.add_argument(
+        "--query-tolerance",
+        type=float,
+        default=0.25,
+        help="allowed growth in queries per request, as a fraction",
+    )
+    args = parser.parse_args()
+
+    settings = {name: getattr(args, name) for name in RUN_SETTINGS}
+    if args.compare:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline["settings"] != settings:
+            expected = " ".join(
+                f"--{name} {value}" for name, value in baseline["settings"].items()
+            )
+            print(f"The baseline was recorded with {expected}; compare with the same")
+            sys.exit(2)
+
+    app = bootstrap(args.database_uri)
+    from backend import db
+    from backend.seed import generate
+
+    with app.app_context():
+        if not args.no_seed:
+            db.create_all()
+            generate(scale=args.scale, seed=args.seed)
+        counter = QueryCounter(db.engine)
+
+    scenarios = Scenarios(app, random.Random(args.seed))
+    names = args.scenarios or Scenarios.NAMES
+
+    if args.concurrency > 1:
+        samples, wall_ms = run_load(
+            app, counter, scenarios, names, args.iterations, args.concurrency, args.seed
+        )
+    else:
+        samples, wall_ms = run_sequential(
+            app, counter, scenarios, names, args.iterations
+        )
+    results = report(samples, wall_ms)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(
+                {"settings": settings, "results": results},
+                file,
+                indent=2,
+                sort_keys=True,
+            )
+        print(f"Baseline written to {args.baseline}")
+
+    if args.compare:
+        regressions = compare(
+            results, baseline["results"], args.latency_tolerance, args.query_tolerance
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
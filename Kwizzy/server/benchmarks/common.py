@@ -0,0 +1,52 @@
+import os
+import statistics
+import tempfile
+from time import perf_counter_ns
+
+BENCH_DIR = tempfile.mkdtemp(prefix="kwizzy_bench_")
+
+
+def bootstrap(database_uri=None):
+    """
+    Point the app at a throwaway database and an in-process cache, then import
+    it. Must run before anything imports `backend`, since the app is created
+    at import time from environment variables.
+    """
+    os.environ.setdefault(
+        "SQLALCHEMY_DATABASE_URI",
+        database_uri or f"sqlite:///{os.path.join(BENCH_DIR, 'bench.db')}",
+    )
+    os.environ.setdefault("CACHE_TYPE", "SimpleCache")
+    # Resolved relative to backend/, like in a normal deployment
+    os.environ.setdefault("UPLOAD_FOLDER", "./static/uploads/subjects")
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-jwt-secret")
+
+    from backend import app
+
+    return app
+
+
+def timed(fn, *args, **kwargs):
+    """Run fn once, returning (result, elapsed milliseconds)"""
+    start = perf_counter_ns()
+    result = fn(*args, **kwargs)
+    return result, (perf_counter_ns() - start) / 1_000_000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+    }
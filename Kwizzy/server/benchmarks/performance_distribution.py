@@ -0,0 +1,112 @@
+"""
+Admin performance distribution: one query per bucket vs one grouped query.
+
+    python -m benchmarks.performance_distribution [--results 1000000] [--users 20000]
+"""
+import argparse
+import random
+from datetime import date, datetime
+
+from sqlalchemy import func, insert
+
+from .common import bootstrap, timed
+
+app = bootstrap()
+
+from backend import db  # noqa: E402
+from backend.api.chart_api import ChartDataApi  # noqa: E402
+from backend.models import Chapter, Quiz, QuizResult, Subject, User  # noqa: E402
+
+BATCH_SIZE = 50_000
+
+
+def seed(num_results, num_users):
+    rng = random.Random(42)
+    subject = Subject(name="Bench", description="benchmark")
+    chapter = Chapter(name="Bench", description="benchmark", subject=subject)
+    quizzes = [
+        Quiz(name=f"Bench {i}", description="benchmark", chapter=chapter)
+        for i in range(50)
+    ]
+    db.session.add_all(quizzes)
+    db.session.commit()
+    quiz_ids = [quiz.id for quiz in quizzes]
+
+    db.session.execute(
+        insert(User),
+        [
+            {
+                "name": f"student{i}",
+                "email": f"student{i}@example.com",
+                "dob": date(2000, 1, 1),
+                "qualification": "Bachelors",
+                "role": "student",
+                "password": "bench",
+            }
+            for i in range(num_users)
+        ],
+    )
+    user_ids = [row[0] for row in db.session.query(User.id).all()]
+
+    completed_at = datetime(2025, 1, 1)
+    for offset in range(0, num_results, BATCH_SIZE):
+        db.session.execute(
+            insert(QuizResult),
+            [
+                {
+                    "quiz_id": rng.choice(quiz_ids),
+                    "user_id": rng.choice(user_ids),
+                    "marks_scored": rng.randint(0, 20),
+                    "total_marks": 20,
+                    "completed_at": completed_at,
+                }
+                for _ in range(min(BATCH_SIZE, num_results - offset))
+            ],
+        )
+    db.session.commit()
+
+
+def per_bucket_queries():
+    """The previous implementation: one distinct-count join per bucket"""
+    ranges = [(90, 100), (70, 89), (50, 69), (0, 49)]
+    return [
+        db.session.query(func.count(func.distinct(User.id)))
+        .join(QuizResult)
+        .filter(
+            User.role == "student",
+            (QuizResult.marks_scored * 100 / QuizResult.total_marks).between(
+                low, high
+            ),
+        )
+        .scalar()
+        for low, high in ranges
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--results", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        _, seed_ms = timed(seed, args.results, args.users)
+        print(f"Seeded {args.results} results in {seed_ms / 1000:.1f}s")
+
+        api = ChartDataApi()
+        for name, run in (
+            ("per-bucket", per_bucket_queries),
+            ("single-pass", api.get_performance_data),
+        ):
+            samples = [timed(run)[1] for _ in range(args.rounds)]
+            print(
+                f"{name:<12} best {min(samples):>10.1f} ms  "
+                f"mean {sum(samples) / len(samples):>10.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
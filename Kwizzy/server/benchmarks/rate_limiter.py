@@ -0,0 +1,116 @@
+"""
+Concurrency check for the Redis rate limiter in backend/utils.py.
+
+Many threads race to reserve units from the same quotas until they are
+exhausted. The run fails if more units were granted than the quota allows,
+and reports how long reservations take.
+
+    python -m benchmarks.rate_limiter                        # fakeredis
+    python -m benchmarks.rate_limiter --redis-url redis://localhost:6379/15
+
+fakeredis needs its Lua extra: pip install "fakeredis[lua]"
+"""
+import argparse
+import random
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter_ns
+
+from .common import bootstrap, summarize
+
+
+def make_client(redis_url):
+    if redis_url:
+        import redis
+
+        return redis.Redis.from_url(redis_url)
+    import fakeredis
+
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+def race(limiter_factory, workers, max_batch, seed):
+    """Reserve random batches from every worker until nothing is granted"""
+    start_line = threading.Barrier(workers)
+
+    def worker(worker_id):
+        limiter = limiter_factory()
+        rng = random.Random(seed + worker_id)
+        granted = 0
+        timings = []
+        start_line.wait()
+        while True:
+            start = perf_counter_ns()
+            got = limiter.reserve(rng.randint(1, max_batch))
+            timings.append((perf_counter_ns() - start) / 1_000_000)
+            if not got:
+                return granted, timings
+            granted += got
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(worker, range(workers)))
+    return sum(r[0] for r in results), [t for r in results for t in r[1]]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--redis-url")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=300)
+    parser.add_argument("--max-batch", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    bootstrap()
+    from backend.utils import RateLimiter, Quota, EmailRateLimiter
+
+    client = make_client(args.redis_url)
+    frozen = lambda: 1_000_000.0  # noqa: E731 keep every reservation in one window
+    failures = []
+
+    scenarios = {
+        "email daily quota": (
+            lambda: EmailRateLimiter(client=client, clock=frozen),
+            EmailRateLimiter.daily_limit,
+        ),
+        "fixed quota": (
+            lambda: RateLimiter(
+                Quota("bench_fixed", args.limit, 3600, sliding=False),
+                client=client,
+                clock=frozen,
+            ),
+            args.limit,
+        ),
+        "sliding + fixed quotas": (
+            lambda: RateLimiter(
+                Quota("bench_sliding", args.limit, 60),
+                Quota("bench_daily", args.limit // 2, 86400, sliding=False),
+                client=client,
+                clock=frozen,
+            ),
+            args.limit // 2,
+        ),
+    }
+
+    for name, (factory, allowed) in scenarios.items():
+        client.flushdb()
+        granted, timings = race(factory, args.workers, args.max_batch, args.seed)
+        stats = summarize(timings)
+        status = "ok" if granted == allowed else "FAIL"
+        print(
+            f"{name:<24} granted {granted}/{allowed}  "
+            f"{stats['count']} reservations  p50 {stats['p50_ms']} ms  "
+            f"p99 {stats['p99_ms']} ms  {status}"
+        )
+        if granted != allowed:
+            failures.append(name)
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Query-count check for QuizResult.to_dict_many.
+
+Serializes batches of quiz results of growing size and fails if the number
+of SQL statements issued changes with the batch size or differs from the
+expected count, which is how an N+1 regression in the serializer shows up.
+
+    python -m benchmarks.result_serialization [--sizes 1 10 100 1000]
+"""
+import argparse
+import sys
+
+from .common import bootstrap, summarize, timed
+
+app = bootstrap()
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.orm import lazyload  # noqa: E402
+from backend import db  # noqa: E402
+from backend.models import QuizResult  # noqa: E402
+from backend.seed import generate  # noqa: E402
+
+# answers, questions, options and quizzes with answers; quizzes only without
+EXPECTED_QUERIES = {True: 4, False: 1}
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def check(counter, sizes, rounds):
+    failures = []
+    for include_answers, expected in EXPECTED_QUERIES.items():
+        for size in sizes:
+            results = (
+                QuizResult.query.options(lazyload(QuizResult.user_answers))
+                .order_by(QuizResult.id)
+                .limit(size)
+                .all()
+            )
+            samples = []
+            for _ in range(rounds):
+                counter.count = 0
+                serialized, elapsed = timed(
+                    QuizResult.to_dict_many, results, include_answers=include_answers
+                )
+                samples.append(elapsed)
+            queries = counter.count
+            stats = summarize(samples)
+            print(
+                f"include_answers={include_answers!s:<6}{len(serialized):>6} results"
+                f"{queries:>4} queries  p50 {stats['p50_ms']} ms"
+            )
+            if queries != expected:
+                failures.append(
+                    f"{len(results)} results with include_answers={include_answers}:"
+                    f" {queries} queries (expected {expected})"
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1, 10, 100, 1000])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        generate(scale=1, seed=42, log=lambda message: None)
+        counter = StatementCounter(db.engine)
+        failures = check(counter, args.sizes, args.rounds)
+
+    for line in failures:
+        print(f"FAIL {line}")
+    if failures:
+        sys.exit(1)
+    print("Query count is independent of the number of results.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Per-submission write latency: one ORM object per answer vs the bulk path.
+
+    python -m benchmarks.submission [--sizes 10 100 500] [--rounds 50]
+"""
+import argparse
+from datetime import date
+
+from .common import bootstrap, summarize, timed
+
+app = bootstrap()
+
+from backend import db  # noqa: E402
+from backend.models import (  # noqa: E402
+    Chapter,
+    Option,
+    Question,
+    Quiz,
+    QuizResult,
+    Subject,
+    User,
+    UserAnswer,
+)
+from backend.submissions import record_submission  # noqa: E402
+from backend.utils import IndianTimeZone  # noqa: E402
+
+
+def make_quiz(num_questions):
+    subject = Subject(name=f"Bench {num_questions}", description="benchmark")
+    chapter = Chapter(name="Bench", description="benchmark", subject=subject)
+    quiz = Quiz(name="Bench", description="benchmark", chapter=chapter)
+    for i in range(num_questions):
+        question = Question(text=f"Question {i}", quiz=quiz)
+        for j in range(4):
+            Option(text=f"Option {j}", is_correct=(j == 0), question=question)
+    db.session.add(quiz)
+    db.session.commit()
+    return quiz
+
+
+def make_answers(quiz):
+    return [
+        {
+            "question_id": question.id,
+            "selected_option": question.options[0].id,
+            "is_correct": True,
+        }
+        for question in quiz.questions
+    ]
+
+
+def orm_submission(quiz_id, user_id, answers):
+    """The per-object path the endpoints used before the bulk writer"""
+    quiz_result = QuizResult(
+        quiz_id=quiz_id,
+        user_id=user_id,
+        marks_scored=len(answers),
+        total_marks=len(answers),
+        completed_at=IndianTimeZone(),
+    )
+    db.session.add(quiz_result)
+    db.session.flush()
+    for answer in answers:
+        db.session.add(
+            UserAnswer(
+                result_id=quiz_result.id,
+                question_id=answer["question_id"],
+                selected_option=answer["selected_option"],
+                is_correct=answer["is_correct"],
+            )
+        )
+    db.session.commit()
+
+
+def bulk_submission(quiz_id, user_id, answers):
+    record_submission(quiz_id, user_id, len(answers), len(answers), answers)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(
+            name="bench",
+            email="bench@example.com",
+            dob=date(2000, 1, 1),
+            qualification="Bachelors",
+            password="bench",
+        )
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+        print(f"{'questions':>9}  {'path':<5}  {'mean ms':>9}  {'p50 ms':>9}  {'p95 ms':>9}")
+        for size in args.sizes:
+            quiz = make_quiz(size)
+            quiz_id = quiz.id
+            answers = make_answers(quiz)
+            for name, submit in (("orm", orm_submission), ("bulk", bulk_submission)):
+                samples = []
+                for _ in range(args.rounds):
+                    _, elapsed = timed(submit, quiz_id, user_id, answers)
+                    samples.append(elapsed)
+                    db.session.expunge_all()
+                stats = summarize(samples)
+                print(
+                    f"{size:>9}  {name:<5}  {stats['mean_ms']:>9}  "
+                    f"{stats['p50_ms']:>9}  {stats['p95_ms']:>9}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""added performance to user score rollups
+
+Revision ID: 3a8f6c2d9e14
+Revises: e41c9a7b3d58
+Create Date: 2025-03-24 10:15:32.604871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a8f6c2d9e14'
+down_revision = 'e41c9a7b3d58'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = {
+    'ix_user_score_rollups_performance_user_id': ['performance', 'user_id'],
+    'ix_user_score_rollups_attempts_user_id': ['attempts', 'user_id'],
+}
+
+
+def upgrade():
+    # db.create_all() on app startup may have created user_score_rollups
+    # with the column and indexes already
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('user_score_rollups')}
+    indexes = {index['name'] for index in inspector.get_indexes('user_score_rollups')}
+    missing = [name for name in INDEXES if name not in indexes]
+    if 'performance' not in columns or missing:
+        with op.batch_alter_table('user_score_rollups', schema=None) as batch_op:
+            if 'performance' not in columns:
+                batch_op.add_column(sa.Column('performance', sa.Float(), nullable=False, server_default='0'))
+            for name in missing:
+                batch_op.create_index(name, INDEXES[name], unique=False)
+
+    op.execute(
+        "UPDATE user_score_rollups SET performance = CASE "
+        "WHEN total_marks_sum > 0 THEN marks_scored_sum * 100.0 / total_marks_sum "
+        "ELSE 0 END"
+    )
+    # Backfill an empty row for every student without results, so sorting by
+    # performance or attempts finds each student in the rollups
+    op.execute(
+        "INSERT INTO user_score_rollups (user_id, attempts, scored_attempts, "
+        "score_sum, marks_scored_sum, total_marks_sum, performance) "
+        "SELECT id, 0, 0, 0, 0, 0, 0 FROM users WHERE role = 'student' "
+        "AND id NOT IN (SELECT user_id FROM user_score_rollups)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('user_score_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_score_rollups_attempts_user_id')
+        batch_op.drop_index('ix_user_score_rollups_performance_user_id')
+        batch_op.drop_column('performance')
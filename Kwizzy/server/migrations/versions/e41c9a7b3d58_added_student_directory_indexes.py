@@ -0,0 +1,98 @@
+"""added student directory indexes
+
+Revision ID: e41c9a7b3d58
+Revises: b5d2f4e8a613
+Create Date: 2025-03-23 11:42:17.318204
+
+"""
+import sqlite3
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41c9a7b3d58'
+down_revision = 'b5d2f4e8a613'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_SEARCH = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5("
+    "name, email, qualification, content='users', content_rowid='id', "
+    "tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_search_insert AFTER INSERT ON users "
+    "BEGIN INSERT INTO users_search(rowid, name, email, qualification) "
+    "VALUES (new.id, new.name, new.email, new.qualification); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_delete AFTER DELETE ON users "
+    "BEGIN INSERT INTO users_search(users_search, rowid, name, email, "
+    "qualification) VALUES ('delete', old.id, old.name, old.email, "
+    "old.qualification); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_update AFTER UPDATE ON users "
+    "BEGIN INSERT INTO users_search(users_search, rowid, name, email, "
+    "qualification) VALUES ('delete', old.id, old.name, old.email, "
+    "old.qualification); INSERT INTO users_search(rowid, name, email, "
+    "qualification) VALUES (new.id, new.name, new.email, new.qualification); "
+    "END",
+    # Index the rows that already exist
+    "INSERT INTO users_search(users_search) VALUES ('rebuild')",
+]
+
+
+def sqlite_has_trigram(bind):
+    # FTS5's trigram tokenizer needs SQLite 3.34+; without it search uses LIKE
+    if sqlite3.sqlite_version_info < (3, 34, 0):
+        return False
+    try:
+        bind.exec_driver_sql(
+            "CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(a, tokenize='trigram')"
+        )
+    except sa.exc.OperationalError:
+        return False
+    bind.exec_driver_sql("DROP TABLE temp.trigram_probe")
+    return True
+
+
+POSTGRES_SEARCH = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_name_trgm "
+    "ON users USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_email_trgm "
+    "ON users USING gin (email gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_qualification_trgm "
+    "ON users USING gin (qualification gin_trgm_ops)",
+]
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_role_qualification_id', ['role', 'qualification', 'id'], unique=False)
+        batch_op.create_index('ix_users_role_dob_id', ['role', 'dob', 'id'], unique=False)
+
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    if dialect == 'sqlite':
+        if sqlite_has_trigram(bind):
+            for statement in SQLITE_SEARCH:
+                op.execute(statement)
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_SEARCH:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS users_search_update")
+        op.execute("DROP TRIGGER IF EXISTS users_search_delete")
+        op.execute("DROP TRIGGER IF EXISTS users_search_insert")
+        op.execute("DROP TABLE IF EXISTS users_search")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_users_qualification_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_users_email_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_users_name_trgm")
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_role_dob_id')
+        batch_op.drop_index('ix_users_role_qualification_id')